@@ -1,34 +1,196 @@
 import os
 import json
-from openai import AzureOpenAI
+import asyncio
+import orjson
+from openai import AzureOpenAI, AsyncAzureOpenAI
 from azure.ai.formrecognizer import DocumentAnalysisClient
+from azure.ai.formrecognizer.aio import DocumentAnalysisClient as AsyncDocumentAnalysisClient
 from azure.core.credentials import AzureKeyCredential
 from dotenv import load_dotenv
 import re
-import math
+from contextlib import nullcontext
+from functools import lru_cache
+import numpy as np
+
+# Lines containing one of these are keys for selection marks, not free text
+_PATTERNS = (
+    "נקבה", "זכר", "במפעל", "ת. דרכים בעבודה", "ת. דרכים בדרך לעבודה/מהעבודה",
+    "תאונה בדרך ללא רכב", "אחר", "הנפגע חבר בקופת חולים", "כללית", "מאוחדת",
+    "מכבי", "לאומית", "הנפגע אינו חבר בקופת חולים", "מהות התאונה"
+)
+
+# Field groups checked by validate_extraction
+_REQUIRED_FIELDS = ("lastName", "firstName", "idNumber", "dateOfInjury",
+                    "timeOfInjury", "accidentDescription", "injuredBodyPart")
+_DATE_FIELDS = ("dateOfBirth", "dateOfInjury", "formFillingDate", "formReceiptDateAtClinic")
+_DATE_PARTS = ("day", "month", "year")
+_PHONE_FIELDS = ("landlinePhone", "mobilePhone")
+_TEXT_FIELDS = ("lastName", "firstName", "accidentDescription", "accidentLocation",
+                "injuredBodyPart")
+_VALID_LANGUAGES = frozenset(("hebrew", "english", "mixed"))
+
+# Forms processed at once by process_forms
+_MAX_CONCURRENT_FORMS = 8
+
+# Form header note; it contains "זכר" but is not a key for a selection mark
+_GENDER_NOTE_LINE = "טופס זה מנוסח בלשון זכר אך פונה לנשים וגברים כאחד"
+
+# Precompiled regexes, so the per-line loop does not go through re's cache.
+# The key patterns are plain literals, matched with one escaped alternation that
+# scans a line once; for 14 short needles this needs no Aho-Corasick automaton.
+_PATTERNS_RE = re.compile("|".join(re.escape(p) for p in _PATTERNS))
+_HAS_DIGIT_RE = re.compile(r'\d')
+_CLEAN_NUMBER_RE = re.compile(r'[^\w.\-]')
+_ID_RE = re.compile(r'\d{9}')
+_NON_DIGIT_RE = re.compile(r'\D')
+_HEBREW_CHAR_RE = re.compile('[\u0590-\u05FF]')
+_LATIN_CHAR_RE = re.compile('[A-Za-z]')
+
+# JSON Schema of the extracted form, sent as the parameters of the extraction function
+def _string_fields(*names):
+    """Schema properties for plain string fields"""
+    return {name: {"type": "string"} for name in names}
+
+
+def _object_schema(properties):
+    """Schema of an object whose properties are all required"""
+    return {"type": "object", "properties": properties, "required": list(properties)}
+
+
+_DATE_SCHEMA = _object_schema(_string_fields(*_DATE_PARTS))
+
+_FORM_SCHEMA = _object_schema({
+    **_string_fields("lastName", "firstName", "idNumber", "gender"),
+    "dateOfBirth": _DATE_SCHEMA,
+    "address": _object_schema(_string_fields(
+        "street", "houseNumber", "entrance", "apartment", "city", "postalCode", "poBox")),
+    **_string_fields("landlinePhone", "mobilePhone", "jobType"),
+    "dateOfInjury": _DATE_SCHEMA,
+    **_string_fields("timeOfInjury", "accidentLocation", "accidentAddress",
+                     "accidentDescription", "injuredBodyPart", "signature"),
+    "formFillingDate": _DATE_SCHEMA,
+    "formReceiptDateAtClinic": _DATE_SCHEMA,
+    "medicalInstitutionFields": _object_schema(_string_fields(
+        "healthFundMember", "natureOfAccident", "medicalDiagnoses")),
+})
+
+_EXTRACTION_FUNCTION = "extract_form"
+_EXTRACTION_TOOLS = [{
+    "type": "function",
+    "function": {
+        "name": _EXTRACTION_FUNCTION,
+        "description": "Record the fields extracted from a Form BL/283",
+        "parameters": _FORM_SCHEMA
+    }
+}]
+_EXTRACTION_TOOL_CHOICE = {"type": "function", "function": {"name": _EXTRACTION_FUNCTION}}
+
+# Static parts of the extraction prompt (with prior knowledge about form structure), assembled
+# once at import. The instructions come first and only the form text and checkbox states vary
+# per form, so the service can reuse its cache of the common prompt prefix across forms
+_PROMPT_INSTRUCTIONS = f"""
+    You are an expert in extracting information from National Insurance Institute forms (ביטוח לאומי) in Hebrew.
+
+    The following text is from a form requesting medical treatment for a self-employed worker injured at work (Form BL/283).
+
+    Important information about the form structure:
+    1. Gender (gender): The form has two options - "זכר" (male) and "נקבה" (female). Extract the value based on which checkbox is selected.
+    2. Accident Location (accidentLocation): The form has several options - "במפעל" (at workplace), "ת. דרכים בעבודה" (traffic accident at work), "ת. דרכים בדרך לעבודה/מהעבודה" (traffic accident on the way to/from work), "תאונה בדרך ללא רכב" (non-vehicle accident on the way), "אחר" (other). Extract the selected option.
+    3. Health Fund (healthFundMember): The form has four options - "כללית" (Clalit), "מאוחדת" (Meuhedet), "מכבי" (Maccabi), "לאומית" (Leumit). Extract the selected option.
+
+    Important guidance for date fields:
+    The form has multiple date fields which follow a specific structure and position in the form:
+    1. Form Filling Date (תאריך מילוי הטופס): Appears first in the form, near section #1.
+    2. Form Receipt Date at Clinic (תאריך קבלת הטופס בקופה): Appears in first section if the form, after the Form Filling Date.
+    3. Date of Birth (תאריך לידה): Appears in the personal details section, typically with the person's name and ID.
+    4. Date of Injury (תאריך הפגיעה):  Appears in the bottom part of the form, typically in the section of accident details.
+
+    Appears in the bottom part of the form, typically before section #5.
+
+    For each date field, look for numbers in format DD/MM/YYYY or numbers separated specifically into day, month, and year fields.
+    Look for dates appearing in these specific contexts within the form to correctly assign them.
+
+    Extract all relevant information from the form and return it by calling the {_EXTRACTION_FUNCTION} function.
+
+    For fields that do not appear or cannot be extracted, use an empty string.
+    Pay special attention to:
+    1. Correctly extracting gender, accident location, and health fund according to the selected checkboxes
+    2. Properly breaking down dates into day, month, and year - make sure to match each date with its correct field based on its position and context in the form
+    3. Correctly extracting address details
+    4. For date formats, extract numbers appearing in boxes or fields marked as day (יום), month (חודש), and year (שנה)
+
+    Do not invent information that does not exist in the form. If an information item does not appear, use an empty string.
 
-def ocr_extractor(file_path) -> dict:
+    Form text:
     """
-    Extracts text and selection marks from a form using Azure Document Intelligence
+_PROMPT_MID = """
+
+    Checkbox states in the form (when state=selected, the checkbox is checked):
     """
+
+_SYSTEM_MESSAGE = "You are an expert assistant in processing forms and documents in Hebrew submitted to the National Insurance Institute."
+
+
+def _form_client_kwargs():
+    """Read the Document Intelligence settings from the environment"""
     load_dotenv()
 
     endpoint = os.getenv("AZURE_FORM_RECOGNIZER_ENDPOINT")
     key = os.getenv("AZURE_FORM_RECOGNIZER_KEY")
 
-    # Create the client
-    client = DocumentAnalysisClient(
-        endpoint=endpoint,
-        credential=AzureKeyCredential(key)
-    )
+    return {"endpoint": endpoint, "credential": AzureKeyCredential(key)}
+
+
+def _openai_client_kwargs():
+    """Read the Azure OpenAI settings from the environment"""
+    load_dotenv()
+
+    # Get OpenAI configuration from environment variables
+    api_key = os.getenv("AZURE_OPENAI_API_KEY")
+    endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
+
+    return {"api_key": api_key, "api_version": "2024-12-01-preview", "azure_endpoint": endpoint}
+
+
+def _ocr_polling_interval():
+    """Seconds between polls of an analyze operation; single-page forms usually finish well under the SDK's 5s default"""
+    return float(os.getenv("OCR_POLL_INTERVAL", "1"))
+
+
+@lru_cache(maxsize=1)
+def _get_form_client():
+    """Create the Document Intelligence client once and reuse it (and its connection pool) across forms"""
+    return DocumentAnalysisClient(**_form_client_kwargs())
+
+
+@lru_cache(maxsize=1)
+def _get_openai_client():
+    """Create the Azure OpenAI client once and reuse it (and its connection pool) across forms"""
+    return AzureOpenAI(**_openai_client_kwargs())
 
-    # Load file
-    with open(file_path, "rb") as f:
-        document_bytes = f.read()
+
+def _document_stream(document):
+    """Open a file path for reading, or pass an already open binary stream (e.g. an upload) through unclosed"""
+    if isinstance(document, (str, os.PathLike)):
+        return open(document, "rb")
+    return nullcontext(document)
+
+
+def ocr_extractor(document) -> dict:
+    """
+    Extracts text and selection marks from a form using Azure Document Intelligence
+
+    `document` is a file path or a readable binary file-like object
+    """
+    client = _get_form_client()
+
+    # Stream the file to the service instead of reading it into memory first
+    with _document_stream(document) as f:
         poller = client.begin_analyze_document(
             "prebuilt-layout",
-            document_bytes,
-            pages="1" # only process page 1
+            f,
+            pages="1", # only process page 1
+            polling_interval=_ocr_polling_interval()
         )
         result = poller.result()
 
@@ -36,52 +198,94 @@ def ocr_extractor(file_path) -> dict:
     extracted_data = extract_text_and_marks(result)
     return extracted_data
 
+
+async def ocr_extractor_async(document, client) -> dict:
+    """
+    Async variant of ocr_extractor, using an azure.ai.formrecognizer.aio client
+    """
+    with _document_stream(document) as f:
+        poller = await client.begin_analyze_document(
+            "prebuilt-layout",
+            f,
+            pages="1", # only process page 1
+            polling_interval=_ocr_polling_interval()
+        )
+        result = await poller.result()
+
+    return extract_text_and_marks(result)
+
+
 def clean_number(text):
     """Cleans numbers from unwanted characters"""
-    # Keep only digits, decimal points, and hyphens (removing spaces)
-    cleaned = re.sub(r'[^\w\.\-\s]', '', text)
-    # Remove spaces between digits
-    cleaned = re.sub(r'\s+', '', cleaned)
-    return cleaned
+    # Keep only digits, decimal points, and hyphens; whitespace is dropped in the same pass
+    return _CLEAN_NUMBER_RE.sub('', text)
+
+def polygon_to_array(polygon):
+    """Convert a polygon (sequence of points with .x/.y) to an (n, 2) float array."""
+    return np.fromiter(
+        (v for p in polygon for v in (p.x, p.y)), dtype=np.float64, count=2 * len(polygon)
+    ).reshape(-1, 2)
+
 
 def compute_center(points):
-    """Compute the average (x, y) as the 'center' of the polygon."""
-    avg_x = sum(p['x'] for p in points) / len(points)
-    avg_y = sum(p['y'] for p in points) / len(points)
-    return (avg_x, avg_y)
+    """Compute the average (x, y) as the 'center' of the polygon, given as an (n, 2) array."""
+    return points.mean(axis=0)
 
 
-def match_key_with_checkbox(lines, marks):
+def nearest_right_marks(line_centers, mark_centers):
     """
-    lines: list of dict, each with 'content' and 'polygon'
-    marks: list of dict, each with 'state' and 'position' (the polygon)
+    For each line center, find the index of the closest mark center that lies to its right.
+
+    line_centers: (K, 2) float array
+    mark_centers: (M, 2) float array
+    Returns a list of K mark indices, with None where no mark is to the right of the line.
     """
-    matches = []
+    best_mark_indices = [None] * len(line_centers)
+    if not len(line_centers) or not len(mark_centers):
+        return best_mark_indices
+
+    # Sort the marks by x once; the marks to the right of a line center are
+    # then a suffix of that order, found by binary search
+    order = np.argsort(mark_centers[:, 0], kind='stable')
+    sorted_centers = mark_centers[order]
+    first_right = np.searchsorted(sorted_centers[:, 0], line_centers[:, 0], side='right')
+
+    # Marks left of every line center can never match, so drop them up front
+    offset = int(first_right.min())
+    candidates = sorted_centers[offset:]
+    if not len(candidates):
+        return best_mark_indices
+
+    # (K, M) squared line-to-mark distances in one broadcast (the sqrt is
+    # monotonic, so it does not change the argmin); marks that are not to
+    # the right of the line center get an infinite distance
+    diff = candidates[None, :, :] - line_centers[:, None, :]
+    dist = np.einsum('kmi,kmi->km', diff, diff)
+    dist[np.arange(offset, len(mark_centers))[None, :] < first_right[:, None]] = np.inf
+
+    # Find the closest among the valid marks; on a tie, take the first mark in OCR order
+    # (the x-sorted order would favour the leftmost one)
+    min_dist = dist.min(axis=1)
+    found = np.isfinite(min_dist)
+    tied = dist == min_dist[:, None]
+    best = np.where(tied, order[offset:][None, :], len(mark_centers)).min(axis=1)
+    return [int(index) if ok else None for index, ok in zip(best, found)]
 
-    for line in lines:
-        line_center = compute_center(line['position'])
-        lx, ly = line_center
-
-        # Filter marks that are to the right of the line center
-        valid_marks = []
-        for mark in marks:
-            mark_center = compute_center(mark['position'])
-            mx, my = mark_center
-            if mx > lx:  # only consider marks to the right
-                valid_marks.append((mark, mark_center))
-
-        # Find the closest among the valid marks
-        best_mark = None
-        best_dist = float('inf')
-        for (mark, mark_center) in valid_marks:
-            dist = math.dist(line_center, mark_center)
-            if dist < best_dist:
-                best_dist = dist
-                best_mark = mark
 
+def match_key_with_checkbox(lines, marks):
+    """
+    lines: list of dict, each with 'content' and 'position' (the polygon, as an (n, 2) array)
+    marks: list of dict, each with 'state' and 'position' (the polygon, as an (n, 2) array)
+    """
+    # Compute every center once, instead of once per (line, mark) pair
+    line_centers = np.array([compute_center(line['position']) for line in lines], dtype=float).reshape(-1, 2)
+    mark_centers = np.array([compute_center(mark['position']) for mark in marks], dtype=float).reshape(-1, 2)
+
+    matches = []
+    for line, best_index in zip(lines, nearest_right_marks(line_centers, mark_centers)):
         matches.append({
             "line_content": line['content'],
-            "matched_mark_state": best_mark['state'] if best_mark else None,
+            "matched_mark_state": marks[best_index]['state'] if best_index is not None else None,
         })
 
     return matches
@@ -91,55 +295,51 @@ def extract_text_and_marks(result) -> dict:
     """
     Extract text and selection marks from the OCR result
     """
-    extracted_text = ""
+    text_lines = []
     keys_for_selection_marks = []
-    patterns = [
-        "נקבה", "זכר", "במפעל", "ת. דרכים בעבודה", "ת. דרכים בדרך לעבודה/מהעבודה",
-        "תאונה בדרך ללא רכב", "אחר", "הנפגע חבר בקופת חולים", "כללית", "מאוחדת",
-        "מכבי", "לאומית", "הנפגע אינו חבר בקופת חולים", "מהות התאונה"
-    ]
-
-    # Iterate over the OCR pages
-    for page in result.pages:
-        if page.page_number == 1:  # Only process page 1
-            for line in page.lines:
-                line_text = line.content
-
-                # 1) Check if this line matches any of the patterns
-                has_pattern = any(re.search(pattern, line_text) for pattern in patterns)
-                if has_pattern:
-                    # If the line is not the special "טופס זה מנוסח..." line, add it to keys_for_selection_marks
-                    if line_text != "טופס זה מנוסח בלשון זכר אך פונה לנשים וגברים כאחד":
-                        keys_for_selection_marks.append({
-                            "content": line_text,
-                            "position": [
-                                {"x": p.x, "y": p.y} for p in line.polygon
-                            ] if hasattr(line, 'polygon') else []
-                        })
-                    # Important: Skip adding it to extracted_text
-                    continue
-
-                # 2) If the line doesn't match a pattern, proceed with normal text extraction
-                if re.search(r'\d', line_text):
-                    # Clean content if it has digits
-                    cleaned_content = clean_number(line_text)
-                    extracted_text += cleaned_content + "\n"
-                else:
-                    # Keep it as-is
-                    extracted_text += line_text + "\n"
-
-    # Extract selection marks (checkboxes)
     selection_marks = []
-    for page in result.pages:
-        if page.page_number == 1:
-            for mark in page.selection_marks:
-                # Create a simpler representation of each selection mark
-                selection_marks.append({
-                    "state": mark.state,  # "selected" or "unselected"
-                    "content": mark.content if hasattr(mark, 'content') else "",
-                    "position": [{"x": p.x, "y": p.y} for p in mark.polygon] if hasattr(mark, 'polygon') else []
+
+    # Only page 1 is requested from the service (pages="1"), so it is the first and only page
+    page = result.pages[0] if result.pages else None
+    ocr_lines = page.lines if page else []
+    ocr_marks = page.selection_marks if page else []
+
+    for line in ocr_lines:
+        line_text = line.content
+
+        # 1) Check if this line matches any of the patterns
+        has_pattern = _PATTERNS_RE.search(line_text) is not None
+        if has_pattern:
+            # If the line is not the special "טופס זה מנוסח..." line, add it to keys_for_selection_marks
+            if line_text != _GENDER_NOTE_LINE:
+                polygon = getattr(line, 'polygon', None)
+                keys_for_selection_marks.append({
+                    "content": line_text,
+                    "position": polygon_to_array(polygon) if polygon else np.empty((0, 2))
                 })
+            # Important: Skip adding it to extracted_text
+            continue
 
+        # 2) If the line doesn't match a pattern, proceed with normal text extraction
+        if _HAS_DIGIT_RE.search(line_text):
+            # Clean content if it has digits
+            text_lines.append(clean_number(line_text))
+        else:
+            # Keep it as-is
+            text_lines.append(line_text)
+
+    # Extract selection marks (checkboxes)
+    for mark in ocr_marks:
+        # Create a simpler representation of each selection mark
+        polygon = getattr(mark, 'polygon', None)
+        selection_marks.append({
+            "state": mark.state,  # "selected" or "unselected"
+            "content": getattr(mark, 'content', ""),
+            "position": polygon_to_array(polygon) if polygon else np.empty((0, 2))
+        })
+
+    # Every kept line is newline-terminated
+    extracted_text = "".join(line + "\n" for line in text_lines)
 
     # find the matching lines and selection marks
     matches = match_key_with_checkbox(keys_for_selection_marks, selection_marks)
@@ -150,140 +350,63 @@ def extract_text_and_marks(result) -> dict:
         "selection_marks": matches
     }
 
-def extract_form_data_with_openai(extracted_data):
+def _build_extraction_request(extracted_data):
     """
-    Use Azure OpenAI to extract data from the form with prior knowledge about form structure
+    Build the chat completion arguments for extracting the form fields, with prior knowledge about form structure
     """
-    load_dotenv()
-
-    # Get OpenAI configuration from environment variables
-    api_key = os.getenv("AZURE_OPENAI_API_KEY")
-    endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-    model_name = "gpt-4o"
     deployment = "gpt-4o"
 
-    client = AzureOpenAI(
-        api_key=api_key,
-        api_version="2024-12-01-preview",
-        azure_endpoint=endpoint
-    )
-
-    # Desired JSON structure for output
-    desired_json_structure = """
-    {
-      "lastName": "",
-      "firstName": "",
-      "idNumber": "",
-      "gender": "",
-      "dateOfBirth": {
-        "day": "",
-        "month": "",
-        "year": ""
-      },
-      "address": {
-        "street": "",
-        "houseNumber": "",
-        "entrance": "",
-        "apartment": "",
-        "city": "",
-        "postalCode": "",
-        "poBox": ""
-      },
-      "landlinePhone": "",
-      "mobilePhone": "",
-      "jobType": "",
-      "dateOfInjury": {
-        "day": "",
-        "month": "",
-        "year": ""
-      },
-      "timeOfInjury": "",
-      "accidentLocation": "",
-      "accidentAddress": "",
-      "accidentDescription": "",
-      "injuredBodyPart": "",
-      "signature": "",
-      "formFillingDate": {
-        "day": "",
-        "month": "",
-        "year": ""
-      },
-      "formReceiptDateAtClinic": {
-        "day": "",
-        "month": "",
-        "year": ""
-      },
-      "medicalInstitutionFields": {
-        "healthFundMember": "",
-        "natureOfAccident": "",
-        "medicalDiagnoses": ""
-      }
-    }
-    """
-
-    # Create prompt with prior knowledge about form structure
-    prompt = f"""
-    You are an expert in extracting information from National Insurance Institute forms (ביטוח לאומי) in Hebrew.
-
-    The following text is from a form requesting medical treatment for a self-employed worker injured at work (Form BL/283).
+    # orjson emits compact UTF-8, which keeps the prompt (and its token count) small
+    marks_json = orjson.dumps(extracted_data['selection_marks']).decode()
+    prompt = "".join((_PROMPT_INSTRUCTIONS, extracted_data['text'], _PROMPT_MID, marks_json))
 
-    Form text:
-    {extracted_data['text']}
-
-    Checkbox states in the form (when state=selected, the checkbox is checked):
-    {json.dumps(extracted_data['selection_marks'], ensure_ascii=False)}
-
-    Important information about the form structure:
-    1. Gender (gender): The form has two options - "זכר" (male) and "נקבה" (female). Extract the value based on which checkbox is selected.
-    2. Accident Location (accidentLocation): The form has several options - "במפעל" (at workplace), "ת. דרכים בעבודה" (traffic accident at work), "ת. דרכים בדרך לעבודה/מהעבודה" (traffic accident on the way to/from work), "תאונה בדרך ללא רכב" (non-vehicle accident on the way), "אחר" (other). Extract the selected option.
-    3. Health Fund (healthFundMember): The form has four options - "כללית" (Clalit), "מאוחדת" (Meuhedet), "מכבי" (Maccabi), "לאומית" (Leumit). Extract the selected option.
+    return {
+        "model": deployment,
+        "messages": [
+            {"role": "system", "content": _SYSTEM_MESSAGE},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0.0,
+        "top_p": 0.4,
+        # The schema travels as a function definition instead of being restated in the prompt
+        "tools": _EXTRACTION_TOOLS,
+        "tool_choice": _EXTRACTION_TOOL_CHOICE
+    }
 
-    Important guidance for date fields:
-    The form has multiple date fields which follow a specific structure and position in the form:
-    1. Form Filling Date (תאריך מילוי הטופס): Appears first in the form, near section #1.
-    2. Form Receipt Date at Clinic (תאריך קבלת הטופס בקופה): Appears in first section if the form, after the Form Filling Date.
-    3. Date of Birth (תאריך לידה): Appears in the personal details section, typically with the person's name and ID.
-    4. Date of Injury (תאריך הפגיעה):  Appears in the bottom part of the form, typically in the section of accident details.
 
-    Appears in the bottom part of the form, typically before section #5.
+def _parse_extraction_response(response):
+    """Parse the extracted form fields out of the OpenAI response"""
+    message = response.choices[0].message
+    if not message.tool_calls:
+        return {"error": "OpenAI response has no function call", "raw_response": message.content}
 
-    For each date field, look for numbers in format DD/MM/YYYY or numbers separated specifically into day, month, and year fields.
-    Look for dates appearing in these specific contexts within the form to correctly assign them.
+    arguments = message.tool_calls[0].function.arguments
+    try:
+        return json.loads(arguments)
+    except json.JSONDecodeError:
+        # If parsing fails, return the raw text for debugging
+        return {"error": "Failed to parse OpenAI response", "raw_response": arguments}
 
-    Extract all relevant information from the form and return it in the following JSON structure:
-    {desired_json_structure}
 
-    For fields that do not appear or cannot be extracted, use an empty string.
-    Pay special attention to:
-    1. Correctly extracting gender, accident location, and health fund according to the selected checkboxes
-    2. Properly breaking down dates into day, month, and year - make sure to match each date with its correct field based on its position and context in the form
-    3. Correctly extracting address details
-    4. For date formats, extract numbers appearing in boxes or fields marked as day (יום), month (חודש), and year (שנה)
-
-    Do not invent information that does not exist in the form. If an information item does not appear, use an empty string.
+def extract_form_data_with_openai(extracted_data):
+    """
+    Use Azure OpenAI to extract data from the form with prior knowledge about form structure
     """
+    client = _get_openai_client()
 
     # Call Azure OpenAI
-    response = client.chat.completions.create(
-        model=deployment,
-        messages=[
-            {"role": "system",
-             "content": "You are an expert assistant in processing forms and documents in Hebrew submitted to the National Insurance Institute."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.0,
-        top_p=0.4,
-        response_format={"type": "json_object"}  # Ensure response is in JSON
-    )
+    response = client.chat.completions.create(**_build_extraction_request(extracted_data))
 
     # Extract JSON from the response
-    try:
-        result_text = response.choices[0].message.content
-        result_json = json.loads(result_text)
-        return result_json
-    except json.JSONDecodeError:
-        # If parsing fails, return the raw text for debugging
-        return {"error": "Failed to parse OpenAI response", "raw_response": response.choices[0].message.content}
+    return _parse_extraction_response(response)
+
+
+async def extract_form_data_with_openai_async(extracted_data, client):
+    """
+    Async variant of extract_form_data_with_openai, using an AsyncAzureOpenAI client
+    """
+    response = await client.chat.completions.create(**_build_extraction_request(extracted_data))
+    return _parse_extraction_response(response)
 
 
 def validate_extraction(data):
@@ -299,33 +422,26 @@ def validate_extraction(data):
     }
 
     # Required fields check
-    required_fields = ["lastName", "firstName", "idNumber", "dateOfInjury",
-                       "timeOfInjury", "accidentDescription", "injuredBodyPart"]
-    for field in required_fields:
+    for field in _REQUIRED_FIELDS:
         if not data.get(field):
             validation_results["missing_required_fields"].append(field)
 
     # Count fields for completeness statistics
-    flat_fields = flatten_dict(data)
-    validation_results["field_stats"]["total"] = len(flat_fields)
-
-    for key, value in flat_fields.items():
-        if value and value != "":
-            validation_results["field_stats"]["filled"] += 1
-        else:
-            validation_results["field_stats"]["empty"] += 1
+    total, filled = count_fields(data)
+    validation_results["field_stats"]["total"] = total
+    validation_results["field_stats"]["filled"] = filled
+    validation_results["field_stats"]["empty"] = total - filled
 
     # Format validations
     # ID number check
     if data.get("idNumber"):
-        if not data["idNumber"].isdigit() or len(data["idNumber"]) != 9:
+        if not _ID_RE.fullmatch(data["idNumber"]):
             validation_results["format_issues"].append("idNumber should be 9 digits")
 
     # Date format checks
-    date_fields = ["dateOfBirth", "dateOfInjury", "formFillingDate", "formReceiptDateAtClinic"]
-    for field in date_fields:
+    for field in _DATE_FIELDS:
         if field in data and data[field]:
-            if not all(data[field].get(part) for part in ["day", "month", "year"]):
+            if not all(data[field].get(part) for part in _DATE_PARTS):
                 validation_results["format_issues"].append(f"{field} is incomplete")
             else:
                 # Check if date parts are numeric and in valid ranges
@@ -340,9 +456,9 @@ def validate_extraction(data):
                     validation_results["format_issues"].append(f"{field} has non-numeric components")
 
     # Phone number validations
-    for phone_field in ["landlinePhone", "mobilePhone"]:
+    for phone_field in _PHONE_FIELDS:
         if data.get(phone_field):
-            digits_only = ''.join(c for c in data[phone_field] if c.isdigit())
+            digits_only = _NON_DIGIT_RE.sub('', data[phone_field])
             if len(digits_only) < 7 or len(digits_only) > 10:
                 validation_results["format_issues"].append(f"{phone_field} has invalid format")
 
@@ -368,12 +484,10 @@ def validate_extraction(data):
             validation_results["consistency_issues"].append("Form receipt date at clinic is before form filling date")
 
     # Language checks for text fields
-    text_fields = ["lastName", "firstName", "accidentDescription", "accidentLocation",
-                   "injuredBodyPart"]
-    for field in text_fields:
+    for field in _TEXT_FIELDS:
         if data.get(field) and len(data[field]) > 0:
             detected_language = detect_language(data[field])
-            if detected_language not in ["hebrew", "english", "mixed"]:
+            if detected_language not in _VALID_LANGUAGES:
                 validation_results["format_issues"].append(f"{field} language seems invalid")
 
     # Calculate completeness percentage
@@ -391,22 +505,25 @@ def validate_extraction(data):
     return validation_results
 
 
-def flatten_dict(d, parent_key='', sep='_'):
-    """Flatten a nested dictionary"""
-    items = []
-    for k, v in d.items():
-        new_key = f"{parent_key}{sep}{k}" if parent_key else k
-        if isinstance(v, dict):
-            items.extend(flatten_dict(v, new_key, sep=sep).items())
-        else:
-            items.append((new_key, v))
-    return dict(items)
+def count_fields(d):
+    """Count the leaf fields of a nested dictionary, and how many of them are filled"""
+    total = filled = 0
+    stack = [d]
+    while stack:
+        for value in stack.pop().values():
+            if isinstance(value, dict):
+                stack.append(value)
+            else:
+                total += 1
+                if value:
+                    filled += 1
+    return total, filled
 
 
 def get_date_value(date_dict):
     """Convert a date dict to a comparable value"""
     try:
-        if all(date_dict.get(part) for part in ["day", "month", "year"]):
+        if all(date_dict.get(part) for part in _DATE_PARTS):
             # Convert all parts to integers and create a comparable value
             day = int(date_dict["day"])
             month = int(date_dict["month"])
@@ -419,14 +536,15 @@ def get_date_value(date_dict):
 
 def detect_language(text):
     """Simple language detection for Hebrew/English"""
-    hebrew_chars = sum(1 for c in text if '\u0590' <= c <= '\u05FF')
-    english_chars = sum(1 for c in text if ('a' <= c.lower() <= 'z'))
+    # Only the presence of each script matters, so stop at the first character of each
+    has_hebrew = _HEBREW_CHAR_RE.search(text) is not None
+    has_english = _LATIN_CHAR_RE.search(text) is not None
 
-    if hebrew_chars > 0 and english_chars > 0:
+    if has_hebrew and has_english:
         return "mixed"
-    elif hebrew_chars > 0:
+    elif has_hebrew:
         return "hebrew"
-    elif english_chars > 0:
+    elif has_english:
         return "english"
     else:
         return "unknown"
@@ -450,12 +568,14 @@ def calculate_confidence_score(validation_results, completeness):
     return max(0, min(100, score))
 
 
-def process_form(file_path):
+def process_form(document):
     """
     Main function to process a form: extract OCR data, extract form fields, and validate
+
+    `document` is a file path or a readable binary file-like object
     """
     # Extract OCR data
-    extracted_data = ocr_extractor(file_path)
+    extracted_data = ocr_extractor(document)
     print("debug:", extracted_data)
     # Extract form fields using OpenAI
     form_data = extract_form_data_with_openai(extracted_data)
@@ -468,3 +588,43 @@ def process_form(file_path):
         "validation_results": validation_results
     }
 
+
+async def process_form_async(document, form_client, openai_client):
+    """
+    Async variant of process_form; the OCR and OpenAI waits of one form can overlap with those of others
+    """
+    extracted_data = await ocr_extractor_async(document, form_client)
+    form_data = await extract_form_data_with_openai_async(extracted_data, openai_client)
+
+    return {
+        "form_data": form_data,
+        "validation_results": validate_extraction(form_data)
+    }
+
+
+async def process_forms_async(documents, max_concurrency=_MAX_CONCURRENT_FORMS):
+    """
+    Process several forms concurrently, sharing one Document Intelligence and one OpenAI client.
+    At most `max_concurrency` forms are in flight at once, to stay within the services' rate limits.
+    A form that fails yields its exception in place of its result, so it does not sink the others
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def process_bounded(document, form_client, openai_client):
+        async with semaphore:
+            return await process_form_async(document, form_client, openai_client)
+
+    async with AsyncDocumentAnalysisClient(**_form_client_kwargs()) as form_client, \
+            AsyncAzureOpenAI(**_openai_client_kwargs()) as openai_client:
+        return await asyncio.gather(
+            *(process_bounded(document, form_client, openai_client) for document in documents),
+            return_exceptions=True
+        )
+
+
+def process_forms(documents):
+    """
+    Process a batch of forms (file paths or binary streams); returns one process_form-style
+    result, or the exception raised for that form, per document, in order
+    """
+    return asyncio.run(process_forms_async(documents))
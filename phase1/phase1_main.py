@@ -1,70 +1,71 @@
 import streamlit as st
 import json
-import tempfile
-import os
-from pathlib import Path
-from ocr_extractor import process_form
+from ocr_extractor import process_forms
 
 
-def main():
-    st.title("National Insurance Institute Form Extractor")
-    st.write("Upload a form to extract information")
+def show_result(result, key):
+    """Display the validation results and extracted data of one processed form"""
+    st.success("Form processed successfully!")
 
-    uploaded_file = st.file_uploader("Upload a form (PDF/JPG)", type=["pdf", "jpg", "jpeg"])
+    # Show validation results
+    if (result["validation_results"]["missing_required_fields"] or
+            result["validation_results"]["format_issues"] or
+            result["validation_results"]["consistency_issues"]):  # Added this line
 
-    if uploaded_file:
-        # Save the uploaded file to a temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=Path(uploaded_file.name).suffix) as temp_file:
-            temp_file.write(uploaded_file.getbuffer())
-            temp_file_path = temp_file.name
-
-        # Process the file and extract information
-        with st.spinner("Processing form..."):
-            try:
-                result = process_form(temp_file_path)
+        st.warning("Validation issues detected:")
 
-                # Display the extracted data
-                st.success("Form processed successfully!")
+        if result["validation_results"]["missing_required_fields"]:
+            st.write("Missing required fields:",
+                     ", ".join(result["validation_results"]["missing_required_fields"]))
 
-                # Show validation results
-                if (result["validation_results"]["missing_required_fields"] or
-                        result["validation_results"]["format_issues"] or
-                        result["validation_results"]["consistency_issues"]):  # Added this line
+        if result["validation_results"]["format_issues"]:
+            st.write("Format issues:",
+                     ", ".join(result["validation_results"]["format_issues"]))
 
-                    st.warning("Validation issues detected:")
+        # Add this block to display consistency issues
+        if result["validation_results"]["consistency_issues"]:
+            st.write("Consistency issues:",
+                     ", ".join(result["validation_results"]["consistency_issues"]))
+    else:
+        st.success("All data validated successfully!")
 
-                    if result["validation_results"]["missing_required_fields"]:
-                        st.write("Missing required fields:",
-                                 ", ".join(result["validation_results"]["missing_required_fields"]))
+    # Display the structured data
+    st.json(result["form_data"])
 
-                    if result["validation_results"]["format_issues"]:
-                        st.write("Format issues:",
-                                 ", ".join(result["validation_results"]["format_issues"]))
+    # Option to download as JSON
+    st.download_button(
+        label="Download JSON",
+        data=json.dumps(result["form_data"], indent=2, ensure_ascii=False),
+        file_name="extracted_form_data.json",
+        mime="application/json",
+        key=key
+    )
 
-                    # Add this block to display consistency issues
-                    if result["validation_results"]["consistency_issues"]:
-                        st.write("Consistency issues:",
-                                 ", ".join(result["validation_results"]["consistency_issues"]))
-                else:
-                    st.success("All data validated successfully!")
 
-                # Display the structured data
-                st.json(result["form_data"])
+def main():
+    st.title("National Insurance Institute Form Extractor")
+    st.write("Upload forms to extract information")
 
-                # Option to download as JSON
-                st.download_button(
-                    label="Download JSON",
-                    data=json.dumps(result["form_data"], indent=2, ensure_ascii=False),
-                    file_name="extracted_form_data.json",
-                    mime="application/json"
-                )
+    uploaded_files = st.file_uploader("Upload forms (PDF/JPG)", type=["pdf", "jpg", "jpeg"],
+                                      accept_multiple_files=True)
 
+    if uploaded_files:
+        # Process all the files together; their OCR and OpenAI calls run concurrently.
+        # The uploads are binary streams, so they are sent to the OCR service as is
+        with st.spinner("Processing forms..."):
+            try:
+                results = process_forms(uploaded_files)
             except Exception as e:
-                st.error(f"Error processing form: {str(e)}")
+                st.error(f"Error processing forms: {str(e)}")
+                return
 
-            # Clean up the temporary file
-            os.unlink(temp_file_path)
+        for index, (uploaded_file, result) in enumerate(zip(uploaded_files, results)):
+            st.subheader(uploaded_file.name)
+            if isinstance(result, Exception):
+                st.error(f"Error processing form: {str(result)}")
+            else:
+                show_result(result, key=f"download_{index}")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,9 +1,11 @@
 import os
+import sys
 import json
+import asyncio
 import numpy as np
 import pandas as pd
 from pathlib import Path
-from openai import AzureOpenAI
+from openai import AsyncAzureOpenAI
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -13,30 +15,82 @@ load_dotenv()
 AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
 AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
 EMBEDDING_DEPLOYMENT = os.getenv("AZURE_EMBEDDING_DEPLOYMENT", "text-embedding-ada-002")
+# Maximum number of inputs sent in a single embeddings request; 16 is the limit of
+# ada-002 (version 1) deployments and older API versions, raise it where the deployment allows
+EMBEDDING_BATCH_SIZE = int(os.getenv("AZURE_EMBEDDING_BATCH_SIZE", "16"))
+# Number of embeddings requests kept in flight at once
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "10"))
+# Attempts per embeddings request before its batch is given up
+EMBEDDING_MAX_ATTEMPTS = 3
+
+# Record fields written to the metadata CSV, in column order
+METADATA_COLUMNS = ('id', 'service', 'hmo', 'tier', 'file_path', 'text')
+
+# Files under the json_data directory: the records as JSON Lines, and their {id: byte offset} index
+JSON_RECORDS_FILE = 'records.jsonl'
+JSON_INDEX_FILE = 'records_index.json'
 
 # Initialize Azure OpenAI client
-client = AzureOpenAI(
+client = AsyncAzureOpenAI(
     api_key=AZURE_OPENAI_API_KEY,
     api_version="2023-05-15",
     azure_endpoint=AZURE_OPENAI_ENDPOINT
 )
 
 
-def create_embedding(text):
-    """Create an embedding vector for the given text using Azure OpenAI."""
-    try:
-        # Create embedding
-        response = client.embeddings.create(
-            input=text,
-            model=EMBEDDING_DEPLOYMENT
-        )
-
-        # Extract the embedding from the response
-        embedding = response.data[0].embedding
-        return embedding
-    except Exception as e:
-        print(f"Error creating embedding: {e}")
-        return None
+async def create_batch_embeddings(batch, semaphore):
+    """Embed one batch of texts, retrying failed requests with exponential backoff."""
+    async with semaphore:
+        for attempt in range(EMBEDDING_MAX_ATTEMPTS):
+            try:
+                response = await client.embeddings.create(
+                    input=batch,
+                    model=EMBEDDING_DEPLOYMENT
+                )
+                break
+            except Exception as e:
+                if attempt == EMBEDDING_MAX_ATTEMPTS - 1:
+                    raise
+                delay = 2 ** attempt
+                print(f"Embeddings request failed ({e}), retrying in {delay}s")
+                await asyncio.sleep(delay)
+
+    # Each item carries the index of its input, use it to keep the alignment
+    batch_embeddings = [None] * len(batch)
+    for item in response.data:
+        batch_embeddings[item.index] = item.embedding
+    return batch_embeddings
+
+
+async def create_embeddings(texts):
+    """
+    Create embedding vectors for a list of texts, sending batches to Azure OpenAI concurrently.
+
+    Returns a list aligned with `texts`. Raises RuntimeError if any batch still fails after
+    its retries, so that a partial knowledge base is never saved.
+    """
+    semaphore = asyncio.Semaphore(EMBEDDING_CONCURRENCY)
+    starts = range(0, len(texts), EMBEDDING_BATCH_SIZE)
+    batches = [texts[start:start + EMBEDDING_BATCH_SIZE] for start in starts]
+
+    results = await asyncio.gather(
+        *(create_batch_embeddings(batch, semaphore) for batch in batches),
+        return_exceptions=True
+    )
+
+    embeddings = []
+    failed_batches = 0
+    for start, result in zip(starts, results):
+        if isinstance(result, Exception):
+            print(f"Error creating embeddings for batch starting at {start}: {result}")
+            failed_batches += 1
+        else:
+            embeddings.extend(result)
+
+    if failed_batches:
+        raise RuntimeError(f"{failed_batches} of {len(batches)} embeddings batches failed")
+
+    return embeddings
 
 
 def load_json_file(file_path):
@@ -54,35 +108,37 @@ def prepare_text_for_embedding(json_data):
     if not json_data:
         return ""
 
-    # Create a structured text representation of the JSON data
-    text_parts = []
+    get = json_data.get
 
-    # Add category and description
-    text_parts.append(f"Category: {json_data.get('category', '')}")
-    text_parts.append(f"Description: {json_data.get('description', '')}")
-
-    # Add HMO and tier information
-    text_parts.append(f"HMO: {json_data.get('hmo', '')}")
-    text_parts.append(f"Tier: {json_data.get('tier', '')}")
+    # Create a structured text representation of the JSON data:
+    # category, description, HMO and tier information
+    text_parts = [
+        f"Category: {get('category', '')}",
+        f"Description: {get('description', '')}",
+        f"HMO: {get('hmo', '')}",
+        f"Tier: {get('tier', '')}",
+    ]
 
     # Add services information
-    if 'services' in json_data and json_data['services']:
+    services = get('services')
+    if services:
         text_parts.append("Services:")
-        for service in json_data['services']:
-            text_parts.append(f"  - Service Name: {service.get('name', '')}")
-            text_parts.append(f"    Benefits: {service.get('benefits', '')}")
+        text_parts.extend(
+            f"  - Service Name: {service.get('name', '')}\n    Benefits: {service.get('benefits', '')}"
+            for service in services
+        )
 
     # Add contact information
-    if 'contact' in json_data and json_data['contact']:
+    contact = get('contact')
+    if contact:
         text_parts.append("Contact Information:")
-        for key, value in json_data['contact'].items():
-            text_parts.append(f"  - {key}: {value}")
+        text_parts.extend(f"  - {key}: {value}" for key, value in contact.items())
 
     # Join all parts with newlines
     return "\n".join(text_parts)
 
 
-def embed_knowledge_base(processed_data_dir):
+async def embed_knowledge_base(processed_data_dir):
     """Embed all JSON files in the knowledge base."""
     # Create a list to store embedding records
     embedding_records = []
@@ -96,24 +152,28 @@ def embed_knowledge_base(processed_data_dir):
     files_found = 0
     files_embedded = 0
 
-    # Traverse the directory structure
-    for service_dir in os.listdir(processed_data_dir):
-        service_path = os.path.join(processed_data_dir, service_dir)
-        if os.path.isdir(service_path):
-            for hmo_dir in os.listdir(service_path):
-                hmo_path = os.path.join(service_path, hmo_dir)
-                if os.path.isdir(hmo_path):
-                    for tier_file in os.listdir(hmo_path):
-                        if tier_file.endswith('.json'):
+    # Traverse the directory structure and collect the records to embed;
+    # scandir entries carry their file type, so no extra stat call is needed per entry
+    pending_records = []
+    with os.scandir(processed_data_dir) as service_entries:
+        for service_entry in service_entries:
+            if not service_entry.is_dir():
+                continue
+            with os.scandir(service_entry.path) as hmo_entries:
+                for hmo_entry in hmo_entries:
+                    if not hmo_entry.is_dir():
+                        continue
+                    with os.scandir(hmo_entry.path) as tier_entries:
+                        for tier_entry in tier_entries:
+                            if not tier_entry.name.endswith('.json'):
+                                continue
                             files_found += 1
 
-                            # Construct file path
-                            file_path = os.path.join(hmo_path, tier_file)
-
                             # Get metadata from path
-                            service = service_dir
-                            hmo = hmo_dir
-                            tier = tier_file.replace('.json', '')
+                            file_path = tier_entry.path
+                            service = service_entry.name
+                            hmo = hmo_entry.name
+                            tier = tier_entry.name.replace('.json', '')
 
                             print(f"Processing file: {file_path}")
 
@@ -122,30 +182,28 @@ def embed_knowledge_base(processed_data_dir):
                             if not json_data:
                                 continue
 
-                            # Prepare text for embedding
-                            text = prepare_text_for_embedding(json_data)
-
-                            # Create embedding
-                            embedding = create_embedding(text)
-                            if not embedding:
-                                continue
-
-                            files_embedded += 1
-
-                            # Create a record
-                            record = {
+                            # Create a record; the embedding is filled in below
+                            pending_records.append({
                                 'id': f"{service}_{hmo}_{tier}",
                                 'service': service,
                                 'hmo': hmo,
                                 'tier': tier,
                                 'file_path': file_path,
-                                'text': text,
-                                'embedding': embedding,
+                                'text': prepare_text_for_embedding(json_data),
+                                'embedding': None,
                                 'json_data': json_data
-                            }
+                            })
+
+    # Embed each distinct text once, in batched requests instead of one request per file,
+    # and share the vector between the records with identical texts
+    unique_texts = list(dict.fromkeys(record['text'] for record in pending_records))
+    embedding_by_text = dict(zip(unique_texts, await create_embeddings(unique_texts)))
 
-                            embedding_records.append(record)
-                            print(f"Embedded: {file_path}")
+    for record in pending_records:
+        files_embedded += 1
+        record['embedding'] = embedding_by_text[record['text']]
+        embedding_records.append(record)
+        print(f"Embedded: {record['file_path']}")
 
     print(f"Found {files_found} files, successfully embedded {files_embedded} files")
     return embedding_records
@@ -153,21 +211,11 @@ def embed_knowledge_base(processed_data_dir):
 
 def save_embeddings_to_csv(embedding_records, output_file):
     """Save embedding records to a CSV file."""
-    # Create a DataFrame
-    records_for_df = []
-    for record in embedding_records:
-        # Create a copy without the embedding and json_data
-        df_record = {
-            'id': record['id'],
-            'service': record['service'],
-            'hmo': record['hmo'],
-            'tier': record['tier'],
-            'file_path': record['file_path'],
-            'text': record['text'],
-        }
-        records_for_df.append(df_record)
-
-    df = pd.DataFrame(records_for_df)
+    # Create a DataFrame column by column, leaving out the embedding and json_data
+    df = pd.DataFrame({
+        column: [record[column] for record in embedding_records]
+        for column in METADATA_COLUMNS
+    })
     df.to_csv(output_file, index=False)
     print(f"Saved embedding metadata to {output_file}")
 
@@ -181,10 +229,11 @@ def save_embeddings_to_numpy(embedding_records, output_file):
         # Create an empty array
         embeddings_array = np.array([])
     else:
-        # Extract embeddings
-        embeddings = [record['embedding'] for record in embedding_records]
-        # Convert to NumPy array
-        embeddings_array = np.array(embeddings)
+        # Fill a float32 array directly, the precision the embedding model returns
+        dimensions = len(embedding_records[0]['embedding'])
+        embeddings_array = np.empty((len(embedding_records), dimensions), dtype=np.float32)
+        for i, record in enumerate(embedding_records):
+            embeddings_array[i] = record['embedding']
 
     # Save to file
     np.save(output_file, embeddings_array)
@@ -192,15 +241,23 @@ def save_embeddings_to_numpy(embedding_records, output_file):
 
 
 def save_json_data(embedding_records, output_dir):
-    """Save the original JSON data to files for quick access."""
+    """
+    Save the original JSON data for quick access: one JSON Lines file holding every record,
+    plus an index mapping each record id to the byte offset of its line.
+    """
     os.makedirs(output_dir, exist_ok=True)
 
-    for record in embedding_records:
-        output_file = os.path.join(output_dir, f"{record['id']}.json")
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(record['json_data'], f, ensure_ascii=False, indent=2)
+    index = {}
+    with open(os.path.join(output_dir, JSON_RECORDS_FILE), 'wb') as f:
+        for record in embedding_records:
+            index[record['id']] = f.tell()
+            f.write(json.dumps(record['json_data'], ensure_ascii=False).encode('utf-8'))
+            f.write(b"\n")
 
-    print(f"Saved JSON data files to {output_dir}")
+    with open(os.path.join(output_dir, JSON_INDEX_FILE), 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False)
+
+    print(f"Saved JSON data of {len(index)} records to {output_dir}")
 
 
 if __name__ == "__main__":
@@ -218,7 +275,11 @@ if __name__ == "__main__":
 
     # Embed knowledge base
     print("Embedding knowledge base files...")
-    embedding_records = embed_knowledge_base(PROCESSED_DATA_DIR)
+    try:
+        embedding_records = asyncio.run(embed_knowledge_base(PROCESSED_DATA_DIR))
+    except RuntimeError as e:
+        # Leave the existing vector store in place rather than overwrite it with fewer records
+        sys.exit(f"Embedding failed, nothing was saved: {e}")
 
     # Save results
     metadata_csv = os.path.join(OUTPUT_DIR, 'embeddings_metadata.csv')
@@ -1,205 +1,215 @@
 import os
-import json
-from bs4 import BeautifulSoup
+import orjson
+from lxml import html as lxml_html
 import re
 from pathlib import Path
 
+# The pages are UTF-8 but do not declare a charset, so the parser is told explicitly
+_HTML_PARSER = lxml_html.HTMLParser(encoding='utf-8')
+
+# Hebrew name of each HMO
+_HMO_NAMES = {
+    'maccabi': 'מכבי',
+    'meuhedet': 'מאוחדת',
+    'clalit': 'כללית'
+}
+
+# Label that opens an HMO's item in the contact lists
+_HMO_PREFIXES = tuple((f"{hmo_heb}:", hmo_en) for hmo_en, hmo_heb in _HMO_NAMES.items())
+
+# Hebrew name of each tier, as it appears in the HMO cells
+_TIER_NAMES = {
+    'gold': 'זהב',
+    'silver': 'כסף',
+    'bronze': 'ארד'
+}
+
+# Precompiled regexes: a tier's text runs from its label up to the next tier label (or the end)
+_TIER_BY_HEBREW = {tier_heb: tier_en for tier_en, tier_heb in _TIER_NAMES.items()}
+_TIER_LABEL = f"(?:{'|'.join(_TIER_NAMES.values())}):"
+_TIER_RE = re.compile(f"({'|'.join(_TIER_NAMES.values())}):(.*?)(?={_TIER_LABEL}|$)", re.DOTALL)
+_PHONE_RE = re.compile(r'טלפון:(.*?)(?:\n|$)')
+_ADDITIONAL_HEADING_RE = re.compile(r'לפרטים נוספים')
+
 
 def extract_html_content(html_file):
     """Extract structured content from HTML file."""
-    with open(html_file, 'r', encoding='utf-8') as file:
-        soup = BeautifulSoup(file.read(), 'html.parser')
-
-        # Extract title (main category)
-        category = soup.find('h2').text.strip()
-
-        # Extract description (all paragraphs before the table)
-        description_elements = []
-        for elem in soup.find('h2').next_siblings:
-            if elem.name == 'table':
-                break
-            if elem.name == 'p':
-                description_elements.append(elem.text.strip())
-
-        description = ' '.join(description_elements)
-
-        # Extract services from table
-        services = []
-        table = soup.find('table')
-        rows = table.find_all('tr')[1:]  # Skip header row
-
-        for row in rows:
-            cells = row.find_all('td')
-            service_name = cells[0].text.strip()
-
-            # Extract data for each HMO and tier
-            hmo_data = {
-                'maccabi': parse_hmo_cell(cells[1]),
-                'meuhedet': parse_hmo_cell(cells[2]),
-                'clalit': parse_hmo_cell(cells[3])
-            }
+    # libxml2 reads the file itself, so no copy of its contents is made in Python first
+    root = lxml_html.parse(os.fspath(html_file), parser=_HTML_PARSER).getroot()
+
+    # Extract title (main category)
+    title = root.xpath('//h2[1]')[0]
+    category = title.text_content().strip()
+
+    # Extract description (all paragraphs before the table)
+    description_elements = []
+    for elem in title.itersiblings():
+        if elem.tag == 'table':
+            break
+        if elem.tag == 'p':
+            description_elements.append(elem.text_content().strip())
+
+    description = ' '.join(description_elements)
+
+    # Extract services from table
+    services = []
+    rows = root.xpath('(//table)[1]//tr')[1:]  # Skip header row
+
+    for row in rows:
+        # The row's own cells: the service name, then one cell per HMO in _HMO_NAMES order
+        service_cell, *hmo_cells = row.xpath('./td')
+        service_name = service_cell.text_content().strip()
+
+        # Extract data for each HMO and tier
+        hmo_data = {hmo_en: parse_hmo_cell(cell) for hmo_en, cell in zip(_HMO_NAMES, hmo_cells)}
+
+        services.append({
+            'name': service_name,
+            'hmo_data': hmo_data
+        })
+
+    # Extract contact information based on section headings
+    contact_info = {}
+    additional_section = None
+
+    # Find all h3 headings that might contain contact information
+    for heading in root.xpath('//h3'):
+        heading_text = heading.text_content().strip()
+        if additional_section is None and _ADDITIONAL_HEADING_RE.search(heading_text):
+            additional_section = heading
+
+        # The first list after the heading in document order
+        contact_list = heading.xpath('following::ul[1]')
+
+        if contact_list:
+            # Create a dictionary for this specific contact section
+            section_contacts = {}
+            for item in contact_list[0].xpath('.//li'):
+                text = item.text_content().strip()
+                for prefix, hmo_en in _HMO_PREFIXES:
+                    if text.startswith(prefix):
+                        section_contacts[hmo_en] = text[len(prefix):].strip()
+                        break
+
+            # Add this section to the contact_info with the heading as the key
+            if section_contacts:
+                contact_info[heading_text] = section_contacts
+
+    # Extract additional info
+    additional_info = {}
+    if additional_section is not None:
+        info_list = additional_section.xpath('following::ul[1]')
+        if info_list:
+            for item in info_list[0].xpath('.//li'):
+                item_text = item.text_content().strip()
+                for prefix, hmo_en in _HMO_PREFIXES:
+                    if item_text.startswith(prefix):
+                        additional_info[hmo_en] = extract_additional_info(item)
+                        break
 
-            services.append({
-                'name': service_name,
-                'hmo_data': hmo_data
-            })
-
-        # Extract contact information based on section headings
-        contact_info = {}
-
-        # Find all h3 headings that might contain contact information
-        contact_headings = soup.find_all('h3')
-        for heading in contact_headings:
-            heading_text = heading.text.strip()
-            contact_list = heading.find_next('ul')
-
-            if contact_list:
-                # Create a dictionary for this specific contact section
-                section_contacts = {}
-                for item in contact_list.find_all('li'):
-                    text = item.text.strip()
-                    if 'מכבי' in text:
-                        section_contacts['maccabi'] = text.replace('מכבי:', '').strip()
-                    elif 'מאוחדת' in text:
-                        section_contacts['meuhedet'] = text.replace('מאוחדת:', '').strip()
-                    elif 'כללית' in text:
-                        section_contacts['clalit'] = text.replace('כללית:', '').strip()
-
-                # Add this section to the contact_info with the heading as the key
-                if section_contacts:
-                    contact_info[heading_text] = section_contacts
-
-        # Extract additional info
-        additional_info = {}
-        additional_section = soup.find('h3', string=re.compile(r'לפרטים נוספים'))
-        if additional_section:
-            info_list = additional_section.find_next('ul')
-            if info_list:
-                for item in info_list.find_all('li'):
-                    if 'מכבי' in item.text:
-                        additional_info['maccabi'] = extract_additional_info(item)
-                    elif 'מאוחדת' in item.text:
-                        additional_info['meuhedet'] = extract_additional_info(item)
-                    elif 'כללית' in item.text:
-                        additional_info['clalit'] = extract_additional_info(item)
-
-        return {
-            'category': category,
-            'description': description,
-            'services': services,
-            'contact_info': contact_info,
-            'additional_info': additional_info
-        }
+    return {
+        'category': category,
+        'description': description,
+        'services': services,
+        'contact_info': contact_info,
+        'additional_info': additional_info
+    }
 
 
 def parse_hmo_cell(cell):
     """Parse HMO cell to extract tier information."""
-    text = cell.text.strip()
-    tiers = {
-        'gold': {'hebrew': 'זהב', 'data': None},
-        'silver': {'hebrew': 'כסף', 'data': None},
-        'bronze': {'hebrew': 'ארד', 'data': None}
-    }
+    text = cell.text_content().strip()
+    tiers = {'gold': None, 'silver': None, 'bronze': None}
 
-    # Extract information for each tier
-    for tier_en, tier_data in tiers.items():
-        tier_heb = tier_data['hebrew']
-        pattern = re.compile(
-            f"{tier_heb}:(.*?)(?:{list(tiers.values())[0]['hebrew']}:|{list(tiers.values())[1]['hebrew']}:|{list(tiers.values())[2]['hebrew']}:|$)",
-            re.DOTALL)
-        match = pattern.search(text)
-        if match:
-            tiers[tier_en]['data'] = match.group(1).strip()
+    # Extract information for each tier in one pass over the cell; a tier's first label wins
+    for match in _TIER_RE.finditer(text):
+        tier_en = _TIER_BY_HEBREW[match.group(1)]
+        if tiers[tier_en] is None:
+            tiers[tier_en] = match.group(2).strip()
 
-    return {
-        'gold': tiers['gold']['data'],
-        'silver': tiers['silver']['data'],
-        'bronze': tiers['bronze']['data']
-    }
+    return tiers
 
 
 def extract_additional_info(item):
     """Extract additional information like phone and website."""
-    item_text = item.text.strip()
+    item_text = item.text_content().strip()
     info = {}
 
     # Extract phone
-    phone_match = re.search(r'טלפון:(.*?)(?:\n|$)', item_text)
+    phone_match = _PHONE_RE.search(item_text)
     if phone_match:
         info['phone'] = phone_match.group(1).strip()
 
     # Extract website
-    link = item.find('a')
-    if link:
+    link = item.find('.//a')
+    if link is not None:
         info['website'] = link.get('href')
-        info['website_text'] = link.text.strip()
+        info['website_text'] = link.text_content().strip()
 
     return info
 
 
 def create_json_files(data, output_dir, filename_base):
     """Create separate JSON files for each HMO and tier."""
-    hmos = {
-        'maccabi': 'מכבי',
-        'meuhedet': 'מאוחדת',
-        'clalit': 'כללית'
-    }
+    # Index the services and contacts by HMO (and tier) once, instead of rescanning them per file
+    services_by_hmo_tier = {(hmo_en, tier_en): [] for hmo_en in _HMO_NAMES for tier_en in _TIER_NAMES}
+    for service in data['services']:
+        for hmo_en in _HMO_NAMES:
+            service_data = service['hmo_data'][hmo_en]
+            if not service_data:
+                continue
+            for tier_en in _TIER_NAMES:
+                if service_data[tier_en]:
+                    services_by_hmo_tier[(hmo_en, tier_en)].append({
+                        'name': service['name'],
+                        'benefits': service_data[tier_en]
+                    })
 
-    tiers = {
-        'gold': 'זהב',
-        'silver': 'כסף',
-        'bronze': 'ארד'
-    }
+    # An HMO gets a 'contact' field if it appears in a phone numbers section or in the additional info
+    contact_by_hmo = {}
+    for hmo_en in _HMO_NAMES:
+        contact = None
+
+        # Contact information from the appointment section, with the original heading as the field name
+        for section_name, section_data in data['contact_info'].items():
+            if "מספרי טלפון" in section_name and hmo_en in section_data:
+                if contact is None:
+                    contact = {}
+                contact[section_name.replace(' ', '_')] = section_data[hmo_en]
+
+        # Additional information with separate phone and website fields
+        if hmo_en in data['additional_info']:
+            if contact is None:
+                contact = {}
+
+            additional = data['additional_info'][hmo_en]
+            if 'phone' in additional:
+                contact['phone'] = additional['phone']
+            if 'website' in additional:
+                contact['website'] = additional['website']
 
-    for hmo_en, hmo_heb in hmos.items():
+        contact_by_hmo[hmo_en] = contact
+
+    for hmo_en, hmo_heb in _HMO_NAMES.items():
         hmo_dir = os.path.join(output_dir, filename_base, hmo_en)
         os.makedirs(hmo_dir, exist_ok=True)
 
-        for tier_en, tier_heb in tiers.items():
+        for tier_en, tier_heb in _TIER_NAMES.items():
             # Create a JSON object specific to this HMO and tier
             hmo_tier_data = {
                 'category': data['category'],
                 'description': data['description'],
                 'hmo': hmo_heb,
                 'tier': tier_heb,
-                'services': []
+                'services': services_by_hmo_tier[(hmo_en, tier_en)]
             }
+            if contact_by_hmo[hmo_en] is not None:
+                hmo_tier_data['contact'] = contact_by_hmo[hmo_en]
 
-            # Add services specific to this HMO and tier
-            for service in data['services']:
-                service_data = service['hmo_data'][hmo_en]
-                if service_data and service_data[tier_en]:
-                    hmo_tier_data['services'].append({
-                        'name': service['name'],
-                        'benefits': service_data[tier_en]
-                    })
-
-            # Add contact information from the appointment section with the original heading
-            for section_name, section_data in data['contact_info'].items():
-                if "מספרי טלפון" in section_name and hmo_en in section_data:
-                    if 'contact' not in hmo_tier_data:
-                        hmo_tier_data['contact'] = {}
-
-                    # Use the original section name as the field name
-                    field_name = section_name.replace(' ', '_')
-                    hmo_tier_data['contact'][field_name] = section_data[hmo_en]
-
-
-            # Add additional information with separate phone and website fields
-            if hmo_en in data['additional_info']:
-                if 'contact' not in hmo_tier_data:
-                    hmo_tier_data['contact'] = {}
-
-                additional = data['additional_info'][hmo_en]
-                if 'phone' in additional:
-                    hmo_tier_data['contact']['phone'] = additional['phone']
-                if 'website' in additional:
-                    hmo_tier_data['contact']['website'] = additional['website']
-
-            # Write to JSON file
+            # Write to JSON file; orjson encodes straight to UTF-8 bytes, written in one go
             json_file = os.path.join(hmo_dir, f"{tier_en}.json")
-            with open(json_file, 'w', encoding='utf-8') as f:
-                json.dump(hmo_tier_data, f, ensure_ascii=False, indent=4)
+            with open(json_file, 'wb') as f:
+                f.write(orjson.dumps(hmo_tier_data, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE))
 
             print(f"Created {json_file}")
 
@@ -27,13 +27,18 @@ def configure_logging():
     root_logger = logging.getLogger()
     root_logger.setLevel(logging.INFO)
 
-    # Clear any existing handlers
-    if root_logger.handlers:
-        for handler in root_logger.handlers:
-            root_logger.removeHandler(handler)
-
-    # Create a file handler for the log file
-    file_handler = logging.FileHandler(log_file)
+    # Clear any existing handlers (iterating over a copy, as removing changes the list)
+    for handler in root_logger.handlers[:]:
+        root_logger.removeHandler(handler)
+
+    # Create a rotating file handler for the log file, behind a small memory buffer so records
+    # are written in batches; a WARNING record or a full buffer flushes it right away, and
+    # logging's shutdown hook flushes it at exit, so at most a few dozen INFO lines are lost
+    # if the process is killed
+    rotating_handler = logging.handlers.RotatingFileHandler(
+        log_file, maxBytes=10 * 1024 * 1024, backupCount=5, encoding="utf-8")
+    file_handler = logging.handlers.MemoryHandler(
+        capacity=64, flushLevel=logging.WARNING, target=rotating_handler)
     file_handler.setLevel(logging.INFO)
 
     # Create a console handler
@@ -42,7 +47,7 @@ def configure_logging():
 
     # Create a formatter and set it for both handlers
     formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    file_handler.setFormatter(formatter)
+    rotating_handler.setFormatter(formatter)
     console_handler.setFormatter(formatter)
 
     # Add the handlers to the root logger
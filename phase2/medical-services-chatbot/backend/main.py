@@ -1,33 +1,33 @@
 """
 FastAPI application for the Medical Services Chatbot.
 """
-import json
 import logging
 import os
+import orjson
 from typing import List, Dict, Any, Optional
 
 # Load environment variables at the very beginning
 from dotenv import load_dotenv
 
 from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 
+from logging_config import configure_logging
 from openai_client import OpenAIClient
 from prompts import INFORMATION_COLLECTION_PROMPT, VERIFY_USER_INFORMATION_FUNCTION, GET_INFORMATION_FUNCTION
 from utils import verify_user_information, prepare_messages_for_qa, extract_user_info_from_tool_call, get_information
 
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-)
+# Configure logging: console plus a rotating log file
+configure_logging()
 logger = logging.getLogger(__name__)
 
-# Initialize the FastAPI app
-app = FastAPI(title="Medical Services Chatbot API")
+# Initialize the FastAPI app; responses are serialized with orjson rather than the stdlib json
+app = FastAPI(title="Medical Services Chatbot API", default_response_class=ORJSONResponse)
 
 # Add CORS middleware
 app.add_middleware(
@@ -74,21 +74,88 @@ async def chat(request: ChatRequest):
     Process a chat message and return a response.
     """
     try:
-        # Log the request
-        logger.info(f"Received chat request: {request}")
+        chat_response, final_messages = await process_request(request)
+
+        # Make the final API call with the function results, if a function was called
+        if final_messages is not None:
+            final_response = await openai_client.get_chat_completion(final_messages)
+            set_final_content(chat_response, final_response.choices[0].message.content)
+
+        return chat_response
+
+    except Exception as e:
+        logger.error("Error processing chat request: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
 
-        # Process based on conversation phase
-        if request.conversation_phase == "information_collection":
-            return await process_information_collection(request)
-        elif request.conversation_phase == "qa":
-            return await process_qa(request)
-        else:
-            raise HTTPException(status_code=400, detail=f"Invalid conversation phase: {request.conversation_phase}")
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Process a chat message and stream the response as server-sent events.
 
+    Each event carries a JSON object: {"delta": ...} for every piece of the response text,
+    then a last one with "done": true and the fields of a ChatResponse.
+    """
+    try:
+        chat_response, final_messages = await process_request(request)
     except Exception as e:
-        logger.error(f"Error processing chat request: {e}", exc_info=True)
+        logger.error("Error processing chat request: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+    async def events():
+        try:
+            if final_messages is None:
+                yield server_sent_event({"delta": chat_response.response})
+            else:
+                # Forward the final answer as it is generated instead of waiting for all of it
+                parts = []
+                stream = await openai_client.get_chat_completion(final_messages, stream=True)
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        parts.append(chunk.choices[0].delta.content)
+                        yield server_sent_event({"delta": parts[-1]})
+                set_final_content(chat_response, "".join(parts))
+
+            yield server_sent_event({"done": True, **chat_response.dict()})
+        except Exception as e:
+            logger.error("Error streaming chat response: %s", e, exc_info=True)
+            yield server_sent_event({"error": str(e)})
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+def server_sent_event(payload: Dict[str, Any]) -> bytes:
+    """Encode a payload as one server-sent event."""
+    return b"data: " + orjson.dumps(payload) + b"\n\n"
+
+
+def set_final_content(chat_response: ChatResponse, content: str):
+    """Fill in the assistant's final answer on a chat response."""
+    chat_response.response = content
+    chat_response.message_to_add = {"role": "assistant", "content": content}
+
+
+async def process_request(request: ChatRequest):
+    """
+    Process a chat request up to its final answer.
+
+    Returns the chat response and, when a function was called, the messages for the final
+    API call that answers with the function results (None otherwise). The caller makes
+    that call, so that it can either wait for the answer or stream it.
+    """
+    # Log the request; its messages and user info are personal data, so they are logged in full
+    # only at DEBUG level, which is off by default, and never reach the log files otherwise
+    logger.info("Received chat request: phase=%s, %d messages", request.conversation_phase, len(request.messages))
+    logger.debug("Chat request: %s", request)
+
+    # Process based on conversation phase
+    if request.conversation_phase == "information_collection":
+        return await process_information_collection(request)
+    elif request.conversation_phase == "qa":
+        return await process_qa(request)
+    else:
+        raise HTTPException(status_code=400, detail=f"Invalid conversation phase: {request.conversation_phase}")
+
 
 async def process_information_collection(request: ChatRequest):
     """
@@ -103,7 +170,7 @@ async def process_information_collection(request: ChatRequest):
 
     # Call OpenAI API
     functions = [VERIFY_USER_INFORMATION_FUNCTION]
-    response = openai_client.get_chat_completion(messages, functions)
+    response = await openai_client.get_chat_completion(messages, functions)
 
     # Extract the response message
     response_message = response.choices[0].message
@@ -112,6 +179,7 @@ async def process_information_collection(request: ChatRequest):
     # Initialize variables
     tool_calls = []
     user_info = None
+    final_messages = None
     conversation_phase = "information_collection"
     message_to_add = {"role": "assistant", "content": response_content}
 
@@ -120,7 +188,7 @@ async def process_information_collection(request: ChatRequest):
         for tool_call in response_message.tool_calls:
             # Extract the tool call details
             function_name = tool_call.function.name
-            function_args = json.loads(tool_call.function.arguments)
+            function_args = orjson.loads(tool_call.function.arguments)
 
             # Add to tool calls list
             tool_calls.append({
@@ -159,25 +227,21 @@ async def process_information_collection(request: ChatRequest):
                 messages.append(response_message.model_dump())
                 messages.append(function_response)
 
-                # Make a second API call with the validation result
-                final_response = openai_client.get_chat_completion(messages)
-                final_content = final_response.choices[0].message.content
-
-                # Update message to add
-                message_to_add = {"role": "assistant", "content": final_content}
+                # The second API call, with the validation result, answers the user
+                final_messages = messages
 
                 # If validation was successful, change phase to Q&A
                 if "successful" in validation_result:
                     conversation_phase = "qa"
 
-    # Return the chat response
+    # Return the chat response; its content is replaced by the final answer if there is one
     return ChatResponse(
         response=message_to_add["content"],
         conversation_phase=conversation_phase,
         user_info=user_info,
         tool_calls=tool_calls if tool_calls else None,
         message_to_add=message_to_add
-    )
+    ), final_messages
 
 
 async def process_qa(request: ChatRequest):
@@ -185,18 +249,16 @@ async def process_qa(request: ChatRequest):
     Process the Q&A phase using the RAG approach.
     """
     logger.info("==== QA PHASE STARTED ====")
-    logger.info(f"User info: {request.user_info}")
-    logger.info(f"Messages: {[m.role for m in request.messages]}")
+    logger.debug("User info: %s", request.user_info)
+    if logger.isEnabledFor(logging.INFO):
+        # Only build the role list when it is going to be logged
+        logger.info("Messages: %s", [m.role for m in request.messages])
 
     # Ensure we have user info
     if not request.user_info:
         logger.error("Missing user info in QA phase")
         raise HTTPException(status_code=400, detail="User information required for Q&A phase")
 
-    # Ensure we have user info
-    if not request.user_info:
-        raise HTTPException(status_code=400, detail="User information required for Q&A phase")
-
     # Convert Pydantic messages to dictionaries
     messages = [{"role": msg.role, "content": msg.content} for msg in request.messages]
 
@@ -211,7 +273,7 @@ async def process_qa(request: ChatRequest):
     functions = [GET_INFORMATION_FUNCTION]
 
     # Call OpenAI API with function calling
-    response = openai_client.get_chat_completion(qa_messages, functions)
+    response = await openai_client.get_chat_completion(qa_messages, functions)
 
     # Extract the response message
     response_message = response.choices[0].message
@@ -219,6 +281,7 @@ async def process_qa(request: ChatRequest):
 
     # Handle function calls
     tool_calls = []
+    final_messages = None
     if response_message.tool_calls:
         # Add the assistant message with the function call to history
         messages.append(response_message.model_dump())
@@ -226,7 +289,7 @@ async def process_qa(request: ChatRequest):
         for tool_call in response_message.tool_calls:
             # Extract the tool call details
             function_name = tool_call.function.name
-            function_args = json.loads(tool_call.function.arguments)
+            function_args = orjson.loads(tool_call.function.arguments)
 
             # Add to tool calls list
             tool_calls.append({
@@ -239,8 +302,10 @@ async def process_qa(request: ChatRequest):
 
             # Process the get_information function call
             if function_name == "get_information":
-                # Call the function
-                result = get_information(
+                # Call the function in a worker thread: the knowledge base search makes a blocking
+                # embeddings request, which would otherwise hold the event loop for other users
+                result = await run_in_threadpool(
+                    get_information,
                     query=function_args.get("query", ""),
                     hmo=function_args.get("hmo", request.user_info.get("health_fund", "")),
                     tier=function_args.get("tier", request.user_info.get("insurance_tier", ""))
@@ -255,18 +320,17 @@ async def process_qa(request: ChatRequest):
                 }
                 messages.append(function_response)
 
-        # Make a second API call with the function result
-        final_response = openai_client.get_chat_completion(messages)
-        response_content = final_response.choices[0].message.content
+        # The second API call, with the function result, answers the user
+        final_messages = messages
 
-    # Return the chat response
+    # Return the chat response; its content is replaced by the final answer if there is one
     return ChatResponse(
         response=response_content,
         conversation_phase="qa",
         user_info=request.user_info,
         tool_calls=tool_calls if tool_calls else None,
         message_to_add={"role": "assistant", "content": response_content}
-    )
+    ), final_messages
 
 
 @app.get("/health")
@@ -1,12 +1,17 @@
 import os
+import copy
+import json
+import hashlib
 import logging
-from openai import AzureOpenAI
+from collections import OrderedDict
+from openai import AsyncAzureOpenAI
 from typing import List, Dict, Any, Optional
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Responses sampled above this temperature vary too much to be worth replaying
+MAX_CACHEABLE_TEMPERATURE = 0.3
+
 
 class OpenAIClient:
     """Class to handle interactions with Azure OpenAI."""
@@ -26,7 +31,7 @@ class OpenAIClient:
             raise ValueError("Missing AZURE_OPENAI_ENDPOINT environment variable. Please set it in your .env file.")
 
         # Initialize the client
-        self.client = AzureOpenAI(
+        self.client = AsyncAzureOpenAI(
             api_key=api_key,
             api_version="2023-05-15",
             azure_endpoint=endpoint
@@ -36,17 +41,26 @@ class OpenAIClient:
         self.gpt4_deployment = os.getenv("AZURE_GPT4_DEPLOYMENT", "gpt-4o")
         self.gpt4_mini_deployment = os.getenv("AZURE_GPT4_MINI_DEPLOYMENT", "gpt-4o-mini")
 
-        logger.info(f"OpenAI client initialized with endpoint: {endpoint}")
-        logger.info(f"Using deployments - GPT-4: {self.gpt4_deployment}, GPT-4 Mini: {self.gpt4_mini_deployment}")
+        # LRU cache of chat completions, keyed by a hash of the request parameters. It is off
+        # unless enabled, since identical requests from any user or session are then answered
+        # with a copy of the earlier completion. It is only touched between awaits on the event
+        # loop, so it needs no lock
+        self.response_cache_enabled = os.getenv("CHAT_RESPONSE_CACHE", "false").lower() == "true"
+        self.response_cache_size = int(os.getenv("CHAT_RESPONSE_CACHE_SIZE", "256"))
+        self._response_cache = OrderedDict()
+
+        logger.info("OpenAI client initialized with endpoint: %s", endpoint)
+        logger.info("Using deployments - GPT-4: %s, GPT-4 Mini: %s", self.gpt4_deployment, self.gpt4_mini_deployment)
 
-    def get_chat_completion(
+    async def get_chat_completion(
             self,
             messages: List[Dict[str, str]],
             functions: Optional[List[Dict[str, Any]]] = None,
             function_call: Optional[str] = None,
             temperature: float = 0.1,
             top_p: float = 0.4,
-            model: Optional[str] = None
+            model: Optional[str] = None,
+            stream: bool = False
     ) -> Any:
         """
         Get a chat completion from Azure OpenAI.
@@ -58,9 +72,10 @@ class OpenAIClient:
             temperature: Temperature for response generation.
             top_p: Top_p for response generation.
             model: Model deployment to use.
+            stream: Return an async stream of completion chunks instead of the full response.
 
         Returns:
-            The OpenAI API response.
+            The OpenAI API response, or the chunk stream when streaming.
         """
         # Use GPT-4o by default if no model specified
         deployment = model or self.gpt4_deployment
@@ -78,5 +93,34 @@ class OpenAIClient:
             params["tools"] = [{"type": "function", "function": func} for func in functions]
             params["tool_choice"] = "auto" if function_call is None else function_call
 
-        # Call the API
-        return self.client.chat.completions.create(**params)
\ No newline at end of file
+        # Streams are consumed once, so they are never cached
+        if stream:
+            return await self.client.chat.completions.create(**params, stream=True)
+
+        # When enabled, only near-deterministic requests that leave the tool choice to the model are cached
+        if (not self.response_cache_enabled or temperature > MAX_CACHEABLE_TEMPERATURE
+                or function_call is not None):
+            return await self.client.chat.completions.create(**params)
+
+        # Callers get their own copy of a cached completion, so none of them can change it for the others
+        cache_key = self._cache_key(params)
+        response = self._response_cache.get(cache_key)
+        if response is not None:
+            self._response_cache.move_to_end(cache_key)
+            logger.info("Returning cached chat completion")
+            return copy.deepcopy(response)
+
+        # Call the API without blocking the event loop
+        response = await self.client.chat.completions.create(**params)
+
+        self._response_cache[cache_key] = copy.deepcopy(response)
+        if len(self._response_cache) > self.response_cache_size:
+            self._response_cache.popitem(last=False)
+
+        return response
+
+    @staticmethod
+    def _cache_key(params: Dict[str, Any]) -> str:
+        """Stable hash of the chat completion parameters."""
+        canonical = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).hexdigest()
\ No newline at end of file
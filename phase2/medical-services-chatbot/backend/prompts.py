@@ -1,6 +1,7 @@
 """
 Prompt templates and function definitions for the chatbot.
 """
+from functools import lru_cache
 
 # System message for user information collection phase
 INFORMATION_COLLECTION_PROMPT = """
@@ -130,10 +131,20 @@ Do **not** make assumptions or add extra information beyond the function output.
 Never mention that you used a function or vectors in your response.
 """
 
+@lru_cache(maxsize=1024)
+def _format_qa_prompt(full_name, health_fund, insurance_tier):
+    """Format the Q&A prompt; a conversation keeps the same user details, so this is cached."""
+    return QA_PROMPT_TEMPLATE.format(
+        full_name=full_name,
+        health_fund=health_fund,
+        insurance_tier=insurance_tier
+    )
+
+
 def build_qa_prompt(user_info):
     """Build the Q&A prompt with user information."""
-    return QA_PROMPT_TEMPLATE.format(
-        full_name=user_info.get("full_name", ""),
-        health_fund=user_info.get("health_fund", ""),
-        insurance_tier=user_info.get("insurance_tier", "")
+    return _format_qa_prompt(
+        user_info.get("full_name", ""),
+        user_info.get("health_fund", ""),
+        user_info.get("insurance_tier", "")
     )
\ No newline at end of file
@@ -1,8 +1,23 @@
 """
 Utility functions for the chatbot.
 """
+import re
+import orjson
 from typing import Dict, Any, Tuple, List
 from prompts import build_qa_prompt
+from vector_search import search_knowledge_base
+
+# Allowed values of the user information fields
+_GENDERS = frozenset(("זכר", "נקבה", "אחר"))
+_HEALTH_FUNDS = frozenset(("מכבי", "מאוחדת", "כללית"))
+_INSURANCE_TIERS = frozenset(("זהב", "כסף", "ארד"))
+
+_NINE_DIGITS_RE = re.compile(r'\d{9}')
+
+
+def _is_9_digits(value: str) -> bool:
+    """Check that a value is exactly 9 digits."""
+    return _NINE_DIGITS_RE.fullmatch(value) is not None
 
 
 def verify_user_information(
@@ -29,34 +44,36 @@ def verify_user_information(
     Returns:
         Validation result message
     """
-    # Convert age to int if it's a string
-    if isinstance(age, str) and age.isdigit():
-        age = int(age)
-
-    # Validate ID number: must be a 9-digit number
-    if not (id_number.isdigit() and len(id_number) == 9):
-        return "Invalid ID number format. It must be a 9-digit number."
-
-    # Validate age: must be between 0 and 120
-    if not (0 <= int(age) <= 120):
-        return "Invalid age. It must be between 0 and 120."
-
-    # Validate HMO card number: must be a 9-digit number
-    if not (hmo_card_number.isdigit() and len(hmo_card_number) == 9):
-        return "Invalid HMO card number format. It must be a 9-digit number."
+    # Cheapest checks first: set membership, then the digit formats, then the age conversion
 
     # Validate gender
-    if gender not in ["זכר", "נקבה", "אחר"]:
+    if gender not in _GENDERS:
         return "Invalid gender. Must be one of: זכר, נקבה, אחר."
 
     # Validate health fund
-    if health_fund not in ["מכבי", "מאוחדת", "כללית"]:
+    if health_fund not in _HEALTH_FUNDS:
         return "Invalid health fund. Must be one of: מכבי, מאוחדת, כללית."
 
     # Validate insurance tier
-    if insurance_tier not in ["זהב", "כסף", "ארד"]:
+    if insurance_tier not in _INSURANCE_TIERS:
         return "Invalid insurance tier. Must be one of: זהב, כסף, ארד."
 
+    # Validate ID number: must be a 9-digit number
+    if not _is_9_digits(id_number):
+        return "Invalid ID number format. It must be a 9-digit number."
+
+    # Validate HMO card number: must be a 9-digit number
+    if not _is_9_digits(hmo_card_number):
+        return "Invalid HMO card number format. It must be a 9-digit number."
+
+    # Convert age to int if it's a string
+    if isinstance(age, str) and age.isdigit():
+        age = int(age)
+
+    # Validate age: must be between 0 and 120
+    if not (0 <= int(age) <= 120):
+        return "Invalid age. It must be between 0 and 120."
+
     # All validations passed
     return "Validation successful."
 
@@ -77,24 +94,22 @@ def prepare_messages_for_qa(
     Returns:
         List of messages for the chat completion
     """
-    # Build system message with user information
-    system_message = {
-        "role": "system",
-        "content": build_qa_prompt(user_info)
-    }
-
-    # Use provided history or create a new history
-    messages = conversation_history.copy() if conversation_history else []
+    # Use provided history or start a new one; it is not modified
+    history = conversation_history or []
 
     # Add system message at the beginning if not already there
-    if not messages or messages[0]["role"] != "system":
-        messages = [system_message] + messages
+    head = []
+    if not history or history[0]["role"] != "system":
+        # Build system message with user information
+        head = [{"role": "system", "content": build_qa_prompt(user_info)}]
 
     # Add user query if not already added
-    if not messages or messages[-1]["role"] != "user" or messages[-1]["content"] != user_query:
-        messages.append({"role": "user", "content": user_query})
+    tail = []
+    if not history or history[-1]["role"] != "user" or history[-1]["content"] != user_query:
+        tail = [{"role": "user", "content": user_query}]
 
-    return messages
+    # Build the messages as a single new list
+    return [*head, *history, *tail]
 
 
 def extract_user_info_from_tool_call(tool_call: Dict[str, Any]) -> Dict[str, Any]:
@@ -107,10 +122,8 @@ def extract_user_info_from_tool_call(tool_call: Dict[str, Any]) -> Dict[str, Any
     Returns:
         Dictionary of user information
     """
-    import json
-
     # Parse the arguments
-    function_args = json.loads(tool_call["function"]["arguments"])
+    function_args = orjson.loads(tool_call["function"]["arguments"])
 
     # Extract user information
     user_info = {
@@ -138,11 +151,8 @@ def get_information(query, hmo, tier):
     Returns:
         JSON-formatted string with the search results
     """
-    from vector_search import search_knowledge_base
-    import json
-
     # Search the knowledge base
     results = search_knowledge_base(query, hmo, tier)
 
-    # Return the results as a JSON string
-    return json.dumps(results, ensure_ascii=False)
\ No newline at end of file
+    # Return the results as a JSON string; orjson writes the Hebrew text as UTF-8 directly
+    return orjson.dumps(results).decode('utf-8')
\ No newline at end of file
@@ -1,4 +1,5 @@
 import os
+import threading
 from pathlib import Path
 from vector_store import VectorStore
 
@@ -6,20 +7,23 @@ from vector_store import VectorStore
 BASE_DIR = Path(__file__).resolve().parent.parent
 EMBEDDINGS_DIR = BASE_DIR / 'data' / 'embeddings'
 
-# Singleton pattern for the vector store
+# Singleton pattern for the vector store; searches run in worker threads, so creating it is locked
 _vector_store = None
+_vector_store_lock = threading.Lock()
 
 
 def get_vector_store():
     """Get the vector store instance (initialize if needed)."""
     global _vector_store
     if _vector_store is None:
-        try:
-            _vector_store = VectorStore(EMBEDDINGS_DIR)
-        except Exception as e:
-            import logging
-            logging.error(f"Error initializing vector store: {e}")
-            raise
+        with _vector_store_lock:
+            if _vector_store is None:
+                try:
+                    _vector_store = VectorStore(EMBEDDINGS_DIR)
+                except Exception as e:
+                    import logging
+                    logging.error(f"Error initializing vector store: {e}")
+                    raise
     return _vector_store
 
 
@@ -63,25 +67,19 @@ def search_knowledge_base(query, hmo, tier, top_k=6):
         # Get vector store instance
         vector_store = get_vector_store()
 
-        # Search for relevant documents
-        results = vector_store.search(query, top_k=top_k, filter_criteria=filter_criteria)
-
-        # Format the results for the chatbot
-        formatted_results = []
-        for result in results:
-            metadata = result.get('metadata', {})
-            json_data = result.get('json_data', {})
-
-            formatted_result = {
+        # Search for relevant documents, formatting them for the chatbot straight from their records
+        formatted_results = [
+            {
                 "category": json_data.get('category', ''),
                 "description": json_data.get('description', ''),
                 "hmo": json_data.get('hmo', ''),
                 "tier": json_data.get('tier', ''),
-                "similarity": result.get('similarity', 0),
+                "similarity": similarity,
                 "services": json_data.get('services', []),
                 "contact": json_data.get('contact', {})
             }
-            formatted_results.append(formatted_result)
+            for json_data, similarity in vector_store.search_records(query, top_k=top_k, filter_criteria=filter_criteria)
+        ]
 
         return {
             "results": formatted_results,
@@ -1,5 +1,7 @@
 import os
+import gc
 import json
+from functools import lru_cache
 import numpy as np
 import pandas as pd
 from pathlib import Path
@@ -15,13 +17,37 @@ AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
 AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
 EMBEDDING_DEPLOYMENT = os.getenv("AZURE_EMBEDDING_DEPLOYMENT", "text-embedding-ada-002")
 
+# Number of query embeddings kept per vector store, so repeated questions skip the API call
+QUERY_EMBEDDING_CACHE_SIZE = 1024
+
+# Metadata columns of the filter that every chatbot search uses, precomputed at load time
+FILTER_COLUMNS = ('hmo', 'tier')
+
+# Files under the json_data directory, as written by embed_knowledge_base
+JSON_RECORDS_FILE = 'records.jsonl'
+JSON_INDEX_FILE = 'records_index.json'
+
+
+def _normalize_query(query_text):
+    """
+    Normalize the whitespace of a query text before embedding it.
+
+    Queries that differ only in spacing or surrounding blanks then share one cache entry
+    (and one API call); the wording itself is left untouched.
+    """
+    return " ".join(query_text.split())
+
 
 class VectorStore:
     def __init__(self, embeddings_dir=None):
         """Initialize the vector store."""
-        self.metadata_df = None
+        self.metadata = None  # column name -> array of that column's values, one per document
+        self.ids = None
         self.embeddings = None
-        self.json_data_dir = None
+        self._inv_norms = None
+        self._id_to_idx = {}
+        self._filter_cache = {}
+        self._json_cache = {}
 
         # Initialize Azure OpenAI client
         self.client = AzureOpenAI(
@@ -30,6 +56,9 @@ class VectorStore:
             azure_endpoint=AZURE_OPENAI_ENDPOINT
         )
 
+        # Cache the embedding requests of this store; failed requests raise, so they are not cached
+        self._embed_query = lru_cache(maxsize=QUERY_EMBEDDING_CACHE_SIZE)(self._request_query_embedding)
+
         if embeddings_dir:
             self.load_from_directory(embeddings_dir)
 
@@ -42,44 +71,90 @@ class VectorStore:
 
         # Load metadata
         if os.path.exists(metadata_csv):
-            self.metadata_df = pd.read_csv(metadata_csv)
-            print(f"Loaded metadata for {len(self.metadata_df)} documents")
+            metadata_df = pd.read_csv(metadata_csv)
+            print(f"Loaded metadata for {len(metadata_df)} documents")
+
+            # Keep the metadata as plain column arrays, so lookups do not go through pandas
+            self.metadata = {column: metadata_df[column].to_numpy() for column in metadata_df.columns}
+            self.ids = self.metadata['id']
+            self._id_to_idx = {}
+            for idx, doc_id in enumerate(self.ids):
+                self._id_to_idx.setdefault(doc_id, idx)
+
+            # Indices of the documents of each (hmo, tier) pair, so searches skip the filtering
+            self._filter_cache = metadata_df.groupby(list(FILTER_COLUMNS)).indices
         else:
             raise FileNotFoundError(f"Metadata file not found: {metadata_csv}")
 
-        # Load embeddings
+        # Memory-map the embeddings: the vectors stay in the page cache, shared between processes,
+        # instead of being copied into each process. The map is read-only, so instead of normalizing
+        # the vectors in place, keep their inverse norms, which turn a dot product with a unit query
+        # into the cosine similarity (computing them reads the whole file once, at load time)
         if os.path.exists(embeddings_npy):
-            self.embeddings = np.load(embeddings_npy)
+            embeddings = np.load(embeddings_npy, mmap_mode='r')
+            if embeddings.dtype != np.float32:
+                # e.g. a float64 file from an older embed_knowledge_base; it cannot be mapped as float32
+                print(f"Warning: {embeddings_npy} holds {embeddings.dtype} embeddings, not float32; "
+                      f"copying them into memory as float32. Rebuild the vector store to map them instead.")
+                embeddings = embeddings.astype(np.float32)
+            self.embeddings = embeddings
+            self._inv_norms = 1 / np.linalg.norm(self.embeddings, axis=1)
             print(f"Loaded {len(self.embeddings)} embeddings")
         else:
             raise FileNotFoundError(f"Embeddings file not found: {embeddings_npy}")
 
-        # Set JSON data directory
-        if os.path.exists(json_data_dir):
-            self.json_data_dir = json_data_dir
+        # Load all the JSON records once, so searches do not touch the disk
+        json_records_file = os.path.join(json_data_dir, JSON_RECORDS_FILE)
+        json_index_file = os.path.join(json_data_dir, JSON_INDEX_FILE)
+        if os.path.exists(json_records_file) and os.path.exists(json_index_file):
+            with open(json_index_file, 'r', encoding='utf-8') as f:
+                json_offsets = json.load(f)
+            with open(json_records_file, 'rb') as f:
+                records = f.read()
+            self._json_cache = {
+                doc_id: json.loads(records[offset:records.index(b'\n', offset)])
+                for doc_id, offset in json_offsets.items()
+            }
         else:
-            print(f"Warning: JSON data directory not found: {json_data_dir}")
+            print(f"Warning: JSON data not found in: {json_data_dir}")
 
         # Validate lengths
-        if len(self.metadata_df) != len(self.embeddings):
+        if len(self.ids) != len(self.embeddings):
             raise ValueError(
-                f"Mismatch between metadata ({len(self.metadata_df)} records) and embeddings ({len(self.embeddings)} vectors)")
+                f"Mismatch between metadata ({len(self.ids)} records) and embeddings ({len(self.embeddings)} vectors)")
+
+        # Only the column arrays are kept: free the DataFrame and the pandas objects it left in
+        # reference cycles now, in one pass at startup, rather than during a later request
+        del metadata_df
+        gc.collect()
+
+    def _request_query_embedding(self, query_text):
+        """Request the embedding of a query text, as an immutable tuple that is safe to cache."""
+        response = self.client.embeddings.create(
+            input=query_text,
+            model=EMBEDDING_DEPLOYMENT
+        )
+        return tuple(response.data[0].embedding)
 
     def create_query_embedding(self, query_text):
-        """Create an embedding for a query text."""
+        """Create an embedding for a query text, reusing the one of an earlier identical query."""
         try:
-            response = self.client.embeddings.create(
-                input=query_text,
-                model=EMBEDDING_DEPLOYMENT
-            )
-            return response.data[0].embedding
+            return np.asarray(self._embed_query(_normalize_query(query_text)), dtype=np.float32)
         except Exception as e:
             print(f"Error creating query embedding: {e}")
             return None
 
-    def _cosine_similarity(self, a, b):
-        """Calculate cosine similarity between two vectors."""
-        return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
+    def _metadata_at(self, idx):
+        """Get the metadata of the document at an index, as a dictionary."""
+        return {column: values[idx] for column, values in self.metadata.items()}
+
+    def _matching_indices(self, criteria):
+        """Get the indices of the documents whose metadata matches all the criteria; unknown keys are ignored."""
+        mask = np.ones(len(self.ids), dtype=bool)
+        for key, value in criteria.items():
+            if key in self.metadata:
+                mask &= self.metadata[key] == value
+        return np.flatnonzero(mask)
 
     def search(self, query_text, top_k=5, filter_criteria=None):
         """
@@ -94,6 +169,41 @@ class VectorStore:
         Returns:
             List of dictionaries containing search results.
         """
+        results = []
+        for idx, similarity in self._top_hits(query_text, top_k, filter_criteria):
+            # Get metadata
+            metadata = self._metadata_at(idx)
+
+            # Get full JSON data if available
+            json_data = self._json_cache.get(metadata['id'])
+
+            # Add to results
+            result = {
+                'metadata': metadata,
+                'similarity': similarity,
+                'json_data': json_data
+            }
+            results.append(result)
+
+        return results
+
+    def search_records(self, query_text, top_k=5, filter_criteria=None):
+        """
+        Search for similar documents to the query text, returning only their JSON data.
+
+        Takes the same arguments as search, for callers that build their own results
+        from the records and need no metadata.
+
+        Returns:
+            List of (JSON data, similarity) pairs, most similar first.
+        """
+        return [
+            (self._json_cache.get(self.ids[idx]), similarity)
+            for idx, similarity in self._top_hits(query_text, top_k, filter_criteria)
+        ]
+
+    def _top_hits(self, query_text, top_k, filter_criteria):
+        """Find the documents most similar to the query text, as (index, similarity) pairs."""
         # Create query embedding
         query_embedding = self.create_query_embedding(query_text)
         if query_embedding is None:
@@ -102,76 +212,46 @@ class VectorStore:
         # Apply metadata filters if provided
         filtered_indices = None
         if filter_criteria:
-            # Start with all indices
-            filtered_indices = np.arange(len(self.metadata_df))
-
-            # Apply each filter
-            for key, value in filter_criteria.items():
-                if key in self.metadata_df.columns:
-                    # Find indices that match this criteria
-                    key_indices = self.metadata_df[self.metadata_df[key] == value].index.values
-                    # Intersection with existing filtered indices
-                    filtered_indices = np.intersect1d(filtered_indices, key_indices)
+            if filter_criteria.keys() == set(FILTER_COLUMNS):
+                # Look up the precomputed indices of this (hmo, tier) pair
+                key = tuple(filter_criteria[column] for column in FILTER_COLUMNS)
+                filtered_indices = self._filter_cache.get(key, np.empty(0, dtype=np.intp))
+            else:
+                filtered_indices = self._matching_indices(filter_criteria)
 
         # If no filtered indices left or no filters applied, use all indices
         if filtered_indices is None or len(filtered_indices) == 0:
             if filter_criteria:
                 print("Warning: No documents match the filter criteria")
                 return []
-            filtered_indices = np.arange(len(self.metadata_df))
-
-        # Calculate similarities only for filtered documents
-        similarities = []
-        for idx in filtered_indices:
-            similarity = self._cosine_similarity(query_embedding, self.embeddings[idx])
-            similarities.append((idx, similarity))
-
-        # Sort by similarity (highest first)
-        similarities.sort(key=lambda x: x[1], reverse=True)
-
-        # Get top k results
-        top_indices = [idx for idx, _ in similarities[:top_k]]
-
-        # Build result list
-        results = []
-        for i, idx in enumerate(top_indices):
-            # Get metadata
-            metadata = self.metadata_df.iloc[idx].to_dict()
+            filtered_indices = np.arange(len(self.ids))
 
-            # Load full JSON data if available
-            json_data = None
-            if self.json_data_dir:
-                json_file = os.path.join(self.json_data_dir, f"{metadata['id']}.json")
-                if os.path.exists(json_file):
-                    with open(json_file, 'r', encoding='utf-8') as f:
-                        json_data = json.load(f)
+        # Calculate similarities only for filtered documents, in a single matrix-vector product
+        query_vector = query_embedding / np.linalg.norm(query_embedding)
+        similarities = (self.embeddings[filtered_indices] @ query_vector) * self._inv_norms[filtered_indices]
 
-            # Add to results
-            result = {
-                'metadata': metadata,
-                'similarity': similarities[filtered_indices.tolist().index(idx)][1],
-                'json_data': json_data
-            }
-            results.append(result)
+        # Get top k results: select them without a full sort, then order only those (highest first)
+        k = min(top_k, len(similarities))
+        if k <= 0:
+            return []
+        top_positions = np.argpartition(-similarities, k - 1)[:k]
+        top_positions = top_positions[np.argsort(-similarities[top_positions])]
 
-        return results
+        # Python ints and floats, so that the results serialize as JSON
+        return list(zip(filtered_indices[top_positions].tolist(), similarities[top_positions].tolist()))
 
     def get_document_by_id(self, doc_id):
         """Get a document by its ID."""
-        if self.metadata_df is None:
+        if self.metadata is None:
             return None
 
-        if doc_id in self.metadata_df['id'].values:
+        idx = self._id_to_idx.get(doc_id)
+        if idx is not None:
             # Get metadata
-            metadata = self.metadata_df[self.metadata_df['id'] == doc_id].iloc[0].to_dict()
+            metadata = self._metadata_at(idx)
 
-            # Load full JSON data if available
-            json_data = None
-            if self.json_data_dir:
-                json_file = os.path.join(self.json_data_dir, f"{doc_id}.json")
-                if os.path.exists(json_file):
-                    with open(json_file, 'r', encoding='utf-8') as f:
-                        json_data = json.load(f)
+            # Get full JSON data if available
+            json_data = self._json_cache.get(doc_id)
 
             return {
                 'metadata': metadata,
@@ -191,16 +271,10 @@ class VectorStore:
         Returns:
             List of matching document IDs.
         """
-        if self.metadata_df is None:
+        if self.metadata is None:
             return []
 
-        filtered_df = self.metadata_df.copy()
-
-        for key, value in criteria.items():
-            if key in filtered_df.columns:
-                filtered_df = filtered_df[filtered_df[key] == value]
-
-        return filtered_df['id'].tolist()
+        return self.ids[self._matching_indices(criteria)].tolist()
 
 # TODO: delete
 # Example usage when run as a script
@@ -4,7 +4,10 @@ Streamlit frontend for the medical services chatbot.
 
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
 import os
+import re
+import json
 from dotenv import load_dotenv
 import base64
 
@@ -14,6 +17,12 @@ load_dotenv()
 # API Configuration
 API_URL = os.getenv("API_URL", "http://localhost:8000")
 
+# Show the assistant's answers as they are generated, rather than once they are complete
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "true").lower() == "true"
+
+# Hebrew block of the Unicode table, used to detect right-to-left messages
+_HEBREW_CHAR_RE = re.compile(r'[\u0590-\u05FF]')
+
 # Custom CSS
 def load_css():
     st.markdown("""
@@ -79,8 +88,8 @@ def load_css():
 
 def detect_rtl(text):
     """Detect if text contains RTL characters (primarily Hebrew)."""
-    hebrew_chars = sum(1 for char in text if '\u0590' <= char <= '\u05FF')
-    return hebrew_chars > len(text) / 3  # If more than 1/3 of chars are Hebrew
+    hebrew_chars = len(_HEBREW_CHAR_RE.findall(text))
+    return hebrew_chars * 3 > len(text)  # If more than 1/3 of chars are Hebrew
 
 def display_message(role, content):
     """Display a message with the appropriate styling."""
@@ -92,11 +101,25 @@ def display_message(role, content):
     else:
         st.markdown(f'<div class="chat-message assistant"><div class="message {direction_class}">{content}</div></div>', unsafe_allow_html=True)
 
+@st.cache_resource
+def get_http_session():
+    """
+    Get the HTTP session used to call the API.
+
+    Streamlit runs this script again on every interaction, so the session is cached as a
+    resource; its connections are then kept alive and reused across messages.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
 # Function to call the API
 def chat_with_api(messages, user_info, conversation_phase):
     """Call the chat API with the given messages and user info."""
     try:
-        response = requests.post(
+        response = get_http_session().post(
             f"{API_URL}/chat",
             json={
                 "messages": messages,
@@ -115,6 +138,42 @@ def chat_with_api(messages, user_info, conversation_phase):
         st.error(f"Error calling API: {str(e)}")
         return None
 
+def stream_chat_with_api(messages, user_info, conversation_phase, final_response):
+    """
+    Call the streaming chat API, yielding the response text as it arrives.
+
+    The chat response sent with the last event (the same fields chat_with_api returns)
+    is stored in final_response; it stays empty if the call fails.
+    """
+    try:
+        with get_http_session().post(
+            f"{API_URL}/chat/stream",
+            json={
+                "messages": messages,
+                "user_info": user_info,
+                "conversation_phase": conversation_phase
+            },
+            stream=True,
+            timeout=60
+        ) as response:
+            if response.status_code != 200:
+                st.error(f"API Error: {response.status_code} - {response.text}")
+                return
+
+            # Server-sent events, one "data:" line of JSON each; decoded as UTF-8 by json.loads
+            for line in response.iter_lines():
+                if not line.startswith(b"data: "):
+                    continue
+                event = json.loads(line[len(b"data: "):])
+                if "delta" in event:
+                    yield event["delta"]
+                elif "error" in event:
+                    st.error(f"API Error: {event['error']}")
+                elif event.get("done"):
+                    final_response.update(event)
+    except Exception as e:
+        st.error(f"Error calling API: {str(e)}")
+
 # Initialize session state
 def initialize_session_state():
     """Initialize the session state if it doesn't exist."""
@@ -190,11 +249,22 @@ I'll help you find information about medical services available through your Isr
             # st.write(f"Debug - Conversation phase: {st.session_state.conversation_phase}")
 
             # Call the API
-            response = chat_with_api(
-                messages=api_messages,
-                user_info=st.session_state.user_info,
-                conversation_phase=st.session_state.conversation_phase
-            )
+            if STREAM_RESPONSES:
+                # Write the answer out as it arrives; the rerun below then shows it styled
+                response = {}
+                st.write_stream(stream_chat_with_api(
+                    messages=api_messages,
+                    user_info=st.session_state.user_info,
+                    conversation_phase=st.session_state.conversation_phase,
+                    final_response=response
+                ))
+                response = response or None
+            else:
+                response = chat_with_api(
+                    messages=api_messages,
+                    user_info=st.session_state.user_info,
+                    conversation_phase=st.session_state.conversation_phase
+                )
 
             if response:
                 st.write("Debug - Response received:", response)